@@ -1,5 +1,6 @@
 from machine import UART, Pin
 import time
+from checksum import crc16_modbus
 
 class WaterLevelRadarSensor:
     """
@@ -27,15 +28,7 @@ class WaterLevelRadarSensor:
     
     def _calculate_crc16(self, data):
         """Hitung CRC16 Modbus (optimized)"""
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return crc
+        return crc16_modbus(data)
     
     def _create_modbus_frame(self, function_code, start_addr, num_registers):
         """Buat frame Modbus RTU"""
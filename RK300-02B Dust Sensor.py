@@ -8,6 +8,7 @@ Pin Configuration:
 
 from machine import UART, Pin
 import time
+from checksum import crc16_modbus
 
 class RK300_RS485:
     def __init__(self, rst_pin=14, tx_pin=15, rx_pin=16, uart_id=2, baudrate=9600):
@@ -39,16 +40,7 @@ class RK300_RS485:
         
     def _calculate_checksum(self, data):
         """Hitung checksum untuk protokol Modbus RTU"""
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc >>= 1
-                    crc ^= 0xA001
-                else:
-                    crc >>= 1
-        return crc
+        return crc16_modbus(data)
     
     def _send_command(self, command):
         """Kirim perintah via RS485"""
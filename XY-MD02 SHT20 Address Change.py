@@ -14,18 +14,7 @@ PENTING: XY-MD02 menggunakan register 0x07D0 (2000) untuk address!
 
 from machine import UART, Pin
 import time
-
-def crc16_modbus(data):
-    """Calculate Modbus CRC16"""
-    crc = 0xFFFF
-    for byte_val in data:
-        crc ^= byte_val
-        for _ in range(8):
-            if crc & 1:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc
+from checksum import crc16_modbus
 
 def send_command(uart, de_re, command, wait_ms=200):
     """Send command and receive response"""
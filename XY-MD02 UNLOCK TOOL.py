@@ -8,17 +8,7 @@ Perlu unlock sequence dulu sebelum bisa read/write
 
 from machine import UART, Pin
 import time
-
-def crc16_modbus(data):
-    crc = 0xFFFF
-    for byte_val in data:
-        crc ^= byte_val
-        for _ in range(8):
-            if crc & 1:
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc
+from checksum import crc16_modbus
 
 def send_command(uart, de_re, command, wait_ms=200):
     # Add CRC
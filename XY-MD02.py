@@ -1,6 +1,7 @@
 from machine import Pin, UART
 import time
 import struct
+from checksum import crc16_modbus
 
 # === Pin configuration ===
 PIN_RST = Pin(14, Pin.OUT)
@@ -12,16 +13,7 @@ FUNC_READ_INPUT_REGS = 0x04
 
 # === CRC16 (Modbus RTU) ===
 def modbus_crc(data: bytes) -> bytes:
-    crc = 0xFFFF
-    for pos in data:
-        crc ^= pos
-        for _ in range(8):
-            if crc & 1:
-                crc >>= 1
-                crc ^= 0xA001
-            else:
-                crc >>= 1
-    return struct.pack('<H', crc)  # little-endian order
+    return struct.pack('<H', crc16_modbus(data))  # little-endian order
 
 # === Send Modbus request ===
 def modbus_read_input_registers(addr, start_reg, num_regs):
@@ -0,0 +1,139 @@
+"""
+Checksum bersama: CRC16-Modbus dan CRC32 (zlib/ZIP) berbasis tabel 256 entri.
+
+Di MicroPython dipakai varian @micropython.viper (loop native dengan pointer
+langsung ke buffer); di CPython (tes di Linux) dipakai loop tabel biasa.
+Versi bit-per-bit disimpan sebagai referensi dan pembanding benchmark.
+
+Contoh:
+    crc = crc16_modbus(frame, 0, len(frame) - 2)
+    checksum.benchmark()
+"""
+from array import array
+
+try:
+    import micropython
+except ImportError:
+    micropython = None
+
+
+# ============ Tabel ============
+def _make_table(poly, typecode):
+    table = array(typecode, [0] * 256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        table[i] = crc
+    return table
+
+
+_CRC16_TABLE = _make_table(0xA001, "H")
+_CRC32_TABLE = _make_table(0xEDB88320, "I" if array("I").itemsize == 4 else "L")
+
+
+# ============ Referensi (bit-per-bit) ============
+def crc16_bitwise(data, start=0, end=None, crc=0xFFFF):
+    if end is None:
+        end = len(data)
+    for i in range(start, end):
+        crc ^= data[i]
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def crc32_bitwise(data, crc=0):
+    crc ^= 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xEDB88320
+            else:
+                crc >>= 1
+    return crc ^ 0xFFFFFFFF
+
+
+# ============ Tabel (Python biasa) ============
+def _crc16_table(data, start, end, crc):
+    table = _CRC16_TABLE
+    for i in range(start, end):
+        crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xFF]
+    return crc
+
+
+def _crc32_table(data, n, crc):
+    table = _CRC32_TABLE
+    for i in range(n):
+        crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xFF]
+    return crc
+
+
+_crc16_impl = _crc16_table
+_crc32_impl = _crc32_table
+
+# ============ Native (MicroPython) ============
+if micropython is not None:
+    @micropython.viper
+    def _crc16_viper(data: ptr8, start: int, end: int, crc: int) -> int:
+        table = ptr16(_CRC16_TABLE)
+        i = start
+        while i < end:
+            crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xFF]
+            i += 1
+        return crc
+
+    @micropython.viper
+    def _crc32_viper(data: ptr8, n: int, crc: uint) -> uint:
+        table = ptr32(_CRC32_TABLE)
+        i = 0
+        while i < n:
+            crc = (crc >> 8) ^ uint(table[(crc ^ uint(data[i])) & 0xFF])
+            i += 1
+        return crc
+
+    _crc16_impl = _crc16_viper
+    _crc32_impl = _crc32_viper
+
+
+# ============ PUBLIC ============
+def crc16_modbus(data, start=0, end=None, crc=0xFFFF):
+    """CRC16 Modbus RTU dari data[start:end] (hasil: int, byte rendah dikirim dulu)."""
+    if end is None:
+        end = len(data)
+    return _crc16_impl(data, start, end, crc)
+
+
+def crc32(data, crc=0):
+    """CRC32 kompatibel zlib.crc32 / ZIP (hasil: unsigned 32-bit)."""
+    return _crc32_impl(data, len(data), (crc ^ 0xFFFFFFFF) & 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+def benchmark(size=1024, rounds=20):
+    """Cetak throughput (byte/detik) tiap implementasi CRC, kembalikan dict hasil."""
+    from ticks import ticks_us, ticks_diff
+
+    data = bytes((i * 7) & 0xFF for i in range(size))
+    cases = [
+        ("crc16 bitwise", lambda: crc16_bitwise(data), max(1, rounds // 10)),
+        ("crc16 table", lambda: _crc16_table(data, 0, size, 0xFFFF), rounds),
+        ("crc32 bitwise", lambda: crc32_bitwise(data), max(1, rounds // 10)),
+        ("crc32 table", lambda: _crc32_table(data, size, 0xFFFFFFFF), rounds),
+    ]
+    if _crc16_impl is not _crc16_table:
+        cases.append(("crc16 viper", lambda: _crc16_impl(data, 0, size, 0xFFFF), rounds))
+        cases.append(("crc32 viper", lambda: _crc32_impl(data, size, 0xFFFFFFFF), rounds))
+
+    results = {}
+    for name, fn, n in cases:
+        start = ticks_us()
+        for _ in range(n):
+            fn()
+        elapsed = max(1, ticks_diff(ticks_us(), start))
+        results[name] = size * n * 1_000_000 // elapsed
+        print(f"{name:14s}: {results[name]:>10d} B/s")
+    return results
@@ -0,0 +1,342 @@
+import os
+import json
+import struct
+
+# Segment harian: file "<date>.seg" di-preallocate saat ganti hari supaya
+# append berikutnya hanya menyentuh sektor data (tanpa alokasi cluster/FAT).
+# Layout: [header 16 byte][data log ... logical end][ruang kosong ... capacity]
+# Header (sektor 0) hanya ditulis ulang saat grow/close atau tiap `header_every`
+# kali append; mati listrik bisa kehilangan paling banyak sejumlah itu baris.
+_MAGIC = b"PLOG"
+_HEADER_FMT = "<4sII"   # magic, logical end, capacity
+_HEADER_SIZE = 16
+_COPY_CHUNK = 512
+
+
+class DailyLog:
+    def __init__(self, root="/sd", min_size=32 * 1024, grow_size=32 * 1024, headroom=1.25, header_every=16):
+        """
+        Log harian dengan segment contiguous yang di-preallocate.
+
+        Args:
+            root: Folder tujuan (mount point SD card)
+            min_size: Ukuran minimum segment (byte)
+            grow_size: Kelipatan alokasi & ukuran perpanjangan jika segment penuh
+            headroom: Faktor pengali dari volume harian yang teramati
+            header_every: Jumlah append sebelum header & buffer di-flush
+        """
+        self.root = root
+        self.min_size = min_size
+        self.grow_size = grow_size
+        self.headroom = headroom
+        self.header_every = header_every
+
+        self._date = None
+        self._f = None
+        self._end = 0
+        self._capacity = 0
+        self._unsynced = 0
+        self._header = bytearray(_HEADER_SIZE)
+        self._chunk = bytearray(_COPY_CHUNK)
+
+    # ============ PUBLIC ============
+    def write(self, date, line):
+        """Append satu baris ke segment hari `date`."""
+        self.write_many(date, (line,))
+
+    def write_many(self, date, lines):
+        """Append banyak baris sekaligus ke hari aktif (ganti hari jika `date` baru)."""
+        if self._f is not None and self._date is not None and date < self._date:
+            self.backfill(date, lines)
+            return
+        if date != self._date or self._f is None:
+            self._rollover(date)
+
+        data = "".join(f"{line}\n" for line in lines).encode()
+        if not data:
+            return
+        if self._end + len(data) > self._capacity:
+            self._grow(len(data))
+
+        f = self._f
+        f.seek(_HEADER_SIZE + self._end)
+        f.write(data)
+        self._end += len(data)
+        self._unsynced += 1
+        if self._unsynced >= self.header_every:
+            self._sync()
+
+    def backfill(self, date, lines):
+        """
+        Tulis baris milik hari lain (mis. hasil drain spillover) langsung ke
+        file hari itu, tanpa menutup/mengganti segment hari aktif.
+        """
+        if date == self._date and self._f is not None:
+            self.write_many(date, lines)
+            return
+        data = "".join(f"{line}\n" for line in lines).encode()
+        if data:
+            self._append_to(date, data)
+
+    def read(self, date):
+        """Baca isi log (hanya bagian logis) sebagai string, atau None."""
+        if date == self._date and self._f is not None:
+            return self._read_range(self._f, self._end)
+
+        try:
+            with open(self._path(date, "seg"), "rb") as f:
+                end, _ = self._read_header(f)
+                if end is not None:
+                    return self._read_range(f, end)
+        except OSError:
+            pass
+
+        try:
+            with open(self._path(date, "txt"), "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def lines(self, date, offset=0, limit=None):
+        """
+        Generator baris log hari `date` (tanpa newline), dibaca per blok kecil
+        sehingga log sebesar apa pun tidak pernah dimuat utuh ke RAM.
+        Mulai dari baris ke-`offset`, maksimal `limit` baris.
+        """
+        f, start, end, own = self._open_read(date)
+        if f is None:
+            return
+        try:
+            buf = bytearray(_COPY_CHUNK)
+            mv = memoryview(buf)
+            pending = b""
+            pos = 0
+            index = 0
+            while pos < end:
+                # seek ulang tiap blok: handle hari aktif juga dipakai write()
+                f.seek(start + pos)
+                n = f.readinto(mv[:min(_COPY_CHUNK, end - pos)])
+                if not n:
+                    break
+                pos += n
+                parts = (pending + bytes(mv[:n])).split(b"\n")
+                pending = parts.pop()
+                for line in parts:
+                    if index >= offset:
+                        if limit is not None and index - offset >= limit:
+                            return
+                        yield line.decode("utf-8", "ignore")
+                    index += 1
+            if pending and index >= offset and (limit is None or index - offset < limit):
+                yield pending.decode("utf-8", "ignore")
+        finally:
+            if own:
+                f.close()
+
+    def close(self):
+        """Tutup hari aktif: trim segment ke ukuran logis jadi file .txt."""
+        if self._f is None:
+            return
+        date = self._date
+        try:
+            self._finalize(self._f, date, self._end)
+        finally:
+            self._f = None
+            self._date = None
+
+    def reset(self):
+        """Lepas handle tanpa finalize (mis. SD card dicabut)."""
+        try:
+            if self._f:
+                self._write_header()
+                self._f.close()
+        except Exception:
+            pass
+        self._f = None
+        self._date = None
+
+    # ============ PRIVATE: Segment ============
+    def _open_read(self, date):
+        # (file, offset data, panjang logis, perlu ditutup?)
+        if date == self._date and self._f is not None:
+            return self._f, _HEADER_SIZE, self._end, False
+        try:
+            f = open(self._path(date, "seg"), "rb")
+            end, _ = self._read_header(f)
+            if end is not None:
+                return f, _HEADER_SIZE, end, True
+            f.close()
+        except OSError:
+            pass
+        try:
+            path = self._path(date, "txt")
+            return open(path, "rb"), 0, os.stat(path)[6], True
+        except OSError:
+            return None, 0, 0, False
+
+    def _append_to(self, date, data):
+        # segment hari itu (belum ditutup) dilanjutkan di tempat jika muat,
+        # selain itu baris ditambahkan ke <date>.txt
+        try:
+            f = open(self._path(date, "seg"), "r+b")
+        except OSError:
+            f = None
+        if f is not None:
+            try:
+                end, capacity = self._read_header(f)
+                if end is not None and end + len(data) <= capacity:
+                    f.seek(_HEADER_SIZE + end)
+                    f.write(data)
+                    struct.pack_into(_HEADER_FMT, self._header, 0, _MAGIC, end + len(data), capacity)
+                    f.seek(0)
+                    f.write(self._header)
+                    return
+                if end is not None:
+                    # segment penuh: trim ke .txt dulu, bukan penutupan hari normal
+                    self._finalize(f, date, end, record=False)
+                    f = None
+            finally:
+                if f is not None:
+                    f.close()
+        with open(self._path(date, "txt"), "ab") as out:
+            out.write(data)
+
+    def _path(self, date, ext):
+        return f"{self.root}/{date}.{ext}"
+
+    def _rollover(self, date):
+        if self._f is not None:
+            self.close()
+        self._close_stale(date)
+
+        path = self._path(date, "seg")
+        try:
+            f = open(path, "r+b")
+            end, capacity = self._read_header(f)
+            if end is not None:
+                self._f, self._date = f, date
+                self._end, self._capacity = end, capacity
+                self._unsynced = 0
+                return
+            f.close()
+        except OSError:
+            pass
+
+        capacity = self._initial_capacity()
+        f = open(path, "w+b")
+        self._f, self._date = f, date
+        self._end = 0
+        self._capacity = 0
+        self._unsynced = 0
+        self._extend(capacity)
+
+        # file .txt lama (format sebelumnya / sudah ditutup) dilanjutkan di segment
+        try:
+            with open(self._path(date, "txt"), "rb") as old:
+                while True:
+                    n = old.readinto(self._chunk)
+                    if not n:
+                        break
+                    if self._end + n > self._capacity:
+                        self._grow(n)
+                    f.seek(_HEADER_SIZE + self._end)
+                    f.write(memoryview(self._chunk)[:n])
+                    self._end += n
+            os.remove(self._path(date, "txt"))
+        except OSError:
+            pass
+
+        self._sync()
+        print(f"Write to file {date}.seg (prealloc {self._capacity} bytes)")
+
+    def _extend(self, capacity):
+        # seek melewati akhir file lalu tulis 1 byte: FatFs mengalokasikan
+        # cluster sekaligus tanpa menulis isi data
+        f = self._f
+        f.seek(_HEADER_SIZE + capacity - 1)
+        f.write(b"\0")
+        self._capacity = capacity
+        self._sync()
+
+    def _grow(self, need):
+        capacity = self._capacity + self.grow_size
+        while self._end + need > capacity:
+            capacity += self.grow_size
+        self._extend(capacity)
+
+    def _initial_capacity(self):
+        daily = 0
+        try:
+            with open(f"{self.root}/log.meta", "r") as f:
+                daily = json.load(f).get("daily_bytes", 0)
+        except (OSError, ValueError):
+            pass
+        size = max(self.min_size, int(daily * self.headroom))
+        return ((size + self.grow_size - 1) // self.grow_size) * self.grow_size
+
+    def _sync(self):
+        self._write_header()
+        self._f.flush()
+        self._unsynced = 0
+
+    def _write_header(self):
+        struct.pack_into(_HEADER_FMT, self._header, 0, _MAGIC, self._end, self._capacity)
+        self._f.seek(0)
+        self._f.write(self._header)
+
+    def _read_header(self, f):
+        f.seek(0)
+        n = f.readinto(self._header)
+        if n != _HEADER_SIZE:
+            return None, 0
+        magic, end, capacity = struct.unpack_from(_HEADER_FMT, self._header, 0)
+        if magic != _MAGIC or end > capacity:
+            return None, 0
+        return end, capacity
+
+    def _read_range(self, f, end):
+        f.seek(_HEADER_SIZE)
+        return f.read(end).decode("utf-8", "ignore")
+
+    def _finalize(self, f, date, end, record=True):
+        # salin bagian logis ke <date>.txt lalu hapus segment (trim)
+        with open(self._path(date, "txt"), "wb") as out:
+            pos = 0
+            mv = memoryview(self._chunk)
+            while pos < end:
+                f.seek(_HEADER_SIZE + pos)
+                n = f.readinto(mv[:min(_COPY_CHUNK, end - pos)])
+                if not n:
+                    break
+                out.write(mv[:n])
+                pos += n
+        f.close()
+        os.remove(self._path(date, "seg"))
+
+        if record:
+            try:
+                with open(f"{self.root}/log.meta", "w") as meta:
+                    json.dump({"daily_bytes": end}, meta)
+            except OSError:
+                pass
+        print(f"Closed log {date}.txt ({end} bytes)")
+
+    def _close_stale(self, today):
+        # segment hari sebelumnya yang belum sempat ditutup (mis. mati listrik)
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".seg") or name == f"{today}.seg":
+                continue
+            date = name[:-4]
+            try:
+                f = open(self._path(date, "seg"), "r+b")
+                end, _ = self._read_header(f)
+                if end is None:
+                    f.close()
+                    continue
+                self._finalize(f, date, end)
+            except OSError as e:
+                print(f"Error closing stale log {name}:", e)
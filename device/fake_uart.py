@@ -0,0 +1,142 @@
+"""
+Pengganti machine.UART / machine.Pin untuk menjalankan stack Modbus di Linux.
+
+FakeUART meneruskan setiap frame yang ditulis ke `handler(frame)`; byte
+balasannya baru "tiba" setelah frame selesai terkirim + latency, lalu satu
+per satu sesuai waktu karakter dari baudrate, seperti di kabel sungguhan.
+
+Contoh:
+    uart = FakeUART(lambda frame: b"...", baudrate=9600, latency_ms=5)
+    bus = ModbusRTU(uart, de_re=FakePin(), baudrate=9600)
+"""
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from ticks import ticks_us, ticks_add, ticks_diff
+
+
+class FakePin:
+    def __init__(self, value=0):
+        self._value = value
+        self.history = []
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+        self.history.append((ticks_us(), v))
+
+
+class FakeUART:
+    def __init__(self, handler=None, baudrate=9600, bits=8, parity=None, stop=1, latency_ms=5):
+        """
+        Args:
+            handler: Fungsi `handler(frame: bytes) -> bytes | None` (slave palsu),
+                     boleh mengembalikan `(reply, latency_ms)` untuk latency per balasan
+            latency_ms: Waktu jeda slave sebelum mulai membalas
+        """
+        self.handler = handler
+        self.latency_ms = latency_ms
+        self.written = []      # semua frame yang ditulis master
+        self._rx = bytearray()
+        self._rx_times = []    # waktu tiba (ticks_us) tiap byte di _rx
+        self._tx_done = ticks_us()
+        self.init(baudrate, bits, parity, stop)
+
+    # ============ PUBLIC: API machine.UART ============
+    def init(self, baudrate=9600, bits=8, parity=None, stop=1, **kwargs):
+        self.baudrate = baudrate
+        self.bits = bits
+        self.parity = parity
+        self.stop = stop
+        bits_per_char = 1 + bits + (0 if parity is None else 1) + stop
+        self.char_us = (bits_per_char * 1_000_000 + baudrate - 1) // baudrate
+
+    def write(self, buf):
+        frame = bytes(buf)
+        self.written.append(frame)
+        now = ticks_us()
+        start = now if ticks_diff(self._tx_done, now) < 0 else self._tx_done
+        self._tx_done = ticks_add(start, len(frame) * self.char_us)
+
+        reply = self.handler(frame) if self.handler else None
+        latency_ms = self.latency_ms
+        if isinstance(reply, tuple):
+            reply, latency_ms = reply
+        if reply:
+            self.inject(reply, ticks_add(self._tx_done, int(latency_ms * 1000)))
+        return len(frame)
+
+    def any(self):
+        now = ticks_us()
+        n = 0
+        for t in self._rx_times:
+            if ticks_diff(t, now) > 0:
+                break
+            n += 1
+        return n
+
+    def read(self, n=None):
+        available = self.any()
+        if n is None or n > available:
+            n = available
+        if not n:
+            return None
+        data = bytes(self._rx[:n])
+        del self._rx[:n]
+        del self._rx_times[:n]
+        return data
+
+    def readinto(self, buf, n=None):
+        data = self.read(len(buf) if n is None else n)
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def txdone(self):
+        return ticks_diff(self._tx_done, ticks_us()) <= 0
+
+    def flush(self):
+        while not self.txdone():
+            pass
+
+    # ============ PUBLIC: Tes ============
+    def inject(self, data, at=None):
+        """Jadwalkan byte masuk mulai waktu `at` (ticks_us), default sekarang."""
+        t = ticks_us() if at is None else at
+        if self._rx_times and ticks_diff(self._rx_times[-1], t) >= 0:
+            t = ticks_add(self._rx_times[-1], self.char_us)
+        for byte in data:
+            t = ticks_add(t, self.char_us)
+            self._rx.append(byte)
+            self._rx_times.append(t)
+
+    def stream(self):
+        return FakeStream(self)
+
+
+class FakeStream:
+    """Pengganti asyncio.StreamReader(uart) untuk FakeUART."""
+
+    def __init__(self, uart):
+        self.uart = uart
+
+    async def _wait_data(self):
+        while not self.uart.any():
+            times = self.uart._rx_times
+            if times:
+                wait = ticks_diff(times[0], ticks_us())
+                await asyncio.sleep(max(wait, 0) / 1_000_000)
+            else:
+                await asyncio.sleep(0.001)
+
+    async def read(self, n=-1):
+        await self._wait_data()
+        return self.uart.read(None if n < 0 else n)
+
+    async def readinto(self, buf):
+        await self._wait_data()
+        return self.uart.readinto(buf)
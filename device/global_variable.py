@@ -1,3 +1,5 @@
+from telemetry import TelemetryStore
+
 wifi_ap_is_ready = False
 wifi_ap_ip_address = "---.---.---.---"
 
@@ -8,4 +10,4 @@ wifi_sta_ip_address = "---.---.---.---"
 rtc_is_sync_online_time = False
 
 datetime = None
-data_value = {}
+data_value = TelemetryStore(depth=32, max_channels=64) # semua worker menulis, semua konsumen membaca dari sini
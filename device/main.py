@@ -12,8 +12,16 @@ import uasyncio as asyncio
 
 from device import device_id, get_storage, get_memory
 from wifi import AccessPoint, Station
-from microapi import Router
+from microapi import Router, EventStream, Dispatcher, RateLimiter, JSONStream
 from data_json import DataJSON
+from datalog import DailyLog
+from spillover import FlashRing
+from modbus import ModbusRTU, PARITY
+from modbus_poll import PollScheduler
+from modbus_scan import BusScanner
+from modbus_tcp import ModbusTCPGateway
+from modbus_slave import RegisterImage, ModbusSlave
+from telemetry import DeltaFeed
 from rtc import sync_time_and_set_rtc, set_datetime, get_datetime
 
 from global_variable import  wifi_ap_is_ready, wifi_ap_ip_address, wifi_sta_is_online, \
@@ -47,6 +55,17 @@ db_json = DataJSON("db.json", {
     "wifi:pass": "12345678",
     "web:port": 80,
     "web:password": "12345678",
+    "web:max_connections": 8,   # request diproses bersamaan
+    "web:max_queue": 4,         # koneksi antri, sisanya langsung 503
+    "web:max_streams": 4,       # SSE/WebSocket aktif
+    "web:max_long_polls": 4,    # long-poll /api/values yang menunggu
+    "web:max_body": 16384,      # byte, per request
+    "web:max_inflight": 65536,  # byte, total body yang sedang dibaca
+    "web:max_upload": 1048576,  # byte, khusus /upload
+    "web:header_timeout_ms": 5000,
+    "web:body_timeout_ms": 10000,
+    "web:handler_timeout_ms": 15000,
+    "web:gzip_min": 512,        # byte, respons API di atas ini dikompres (null = mati)
 
     # boleh berubah ketika import
     "wifi:station": [
@@ -63,6 +82,22 @@ db_json = DataJSON("db.json", {
     "uart:callback_url": "",
     "board:analog": {},  # 1, 2
     "board:digital": {}, # 21, 38, 47
+    "rs485:baudrate": 9600,
+    "rs485:max_gap": 4, # register kosong maksimal saat menggabung read
+    "rs485:max_registers": 64,
+    "rs485:scan": {}, # hasil discovery terakhir (address, baudrate, parity)
+    "rs485:slave": { # mode slave: box dipolling PLC/SCADA upstream
+        "enable": False,
+        "address": 1,
+        "uart": 2, # 2 = port RS485 bawaan (mode master dimatikan)
+        "tx": None, "rx": None, "de": None, # pin untuk UART lain
+        "baudrate": 9600,
+        "parity": "N",
+        "map": [], # [{"key": "xy1.temperature", "address": 0, "type": "s16", "scale": 10}]
+    },
+    "modbus_tcp:enable": True, # gateway Modbus TCP -> RS485
+    "modbus_tcp:port": 502,
+    "modbus_tcp:cache_ms": 500, # umur cache respons read
     "module:rs485": [],
     "module:lora": [],
     "module:adc": {}, # Analog-to-Digital Converter (ADC): A1, A2, A3
@@ -167,6 +202,37 @@ sdcard_spi = SPI(1, # Anda bisa pilih SPI bus yang tersedia, misalnya SPI(1)
 )
 sdcard_cs = Pin(pin_sdcard_ss, Pin.OUT)
 
+# RS485 (Modbus RTU master, dipakai bersama semua sensor di bus)
+rs485_baudrate = db.get("rs485:baudrate", 9600)
+# txbuf >= ADU terbesar: write() langsung kembali, frame dikirim driver UART
+rs485_uart = UART(2, baudrate=rs485_baudrate, tx=pin_rs485_tx2, rx=pin_rs485_rx2,
+                  bits=8, parity=None, stop=1, txbuf=256)
+rs485 = ModbusRTU(rs485_uart, de_re=Pin(pin_rs485_rst, Pin.OUT), baudrate=rs485_baudrate)
+rs485_scanner = BusScanner(rs485, db)
+
+# RS485 slave (register image telemetry untuk master upstream)
+rs485_slave_config = db.get("rs485:slave", {})
+rs485_slave = None
+rs485_is_slave = False
+if rs485_slave_config.get("enable"):
+    slave_baudrate = rs485_slave_config.get("baudrate", 9600)
+    slave_parity = PARITY.get(rs485_slave_config.get("parity", "N"))
+    if rs485_slave_config.get("uart", 2) == 2:
+        rs485_is_slave = True
+        rs485_uart.init(baudrate=slave_baudrate, bits=8, parity=slave_parity, stop=1)
+        slave_uart, slave_de = rs485_uart, Pin(pin_rs485_rst, Pin.OUT)
+    else:
+        slave_uart = UART(rs485_slave_config["uart"], baudrate=slave_baudrate,
+                          tx=rs485_slave_config["tx"], rx=rs485_slave_config["rx"],
+                          bits=8, parity=slave_parity, stop=1, txbuf=256)
+        de = rs485_slave_config.get("de")
+        slave_de = Pin(de, Pin.OUT) if de is not None else None
+    rs485_slave = ModbusSlave(slave_uart, rs485_slave_config.get("address", 1),
+                              RegisterImage(rs485_slave_config.get("map", [])),
+                              de_re=slave_de, baudrate=slave_baudrate, parity=slave_parity)
+    # image di-refresh setiap sampel baru masuk ke telemetry store
+    data_value.listen(lambda name, value, seq: rs485_slave.image.update(name, value))
+
 ## ============================================== ##
 # Setup Special Function
 
@@ -235,22 +301,22 @@ def wifi_sta_connect(ssid, password):
     return station
 
 # Log
-last_date = ""
+daily_log = DailyLog("/sd")
+spillover = FlashRing("/spill") # cadangan di flash internal saat SD card tidak ada
 def write_log(value):
-    global last_date
     if not datetime:
         return
-    filename = datetime["date"]
-    if last_date != filename:
-        print(f"Write to file {filename}.txt")
-    with open(f"/sd/{filename}.txt", "a") as f:
-        f.seek(0, 2)  # 2 = os.SEEK_END → ke akhir file
-        f.write(f"{value}\n")
-        last_date = filename
+    daily_log.write(datetime["date"], value)
+def write_spillover(value):
+    if not datetime:
+        return
+    try:
+        spillover.append(datetime["date"], value)
+    except Exception as e:
+        print("Error during spillover write:", e)
 def read_log(filename):
     try:
-        with open(f"/sd/{filename}.txt", "r") as f:
-            return f.read()
+        return daily_log.read(filename)
     except Exception as e:
         print("Error during SD-card read:", e)
 
@@ -422,10 +488,25 @@ def clear_directory(directory_path):
 ## ============================================== ##
 # Setup Router
 
-app = Router()
+app = Router(
+    max_connections=db.get("web:max_connections", 8),
+    max_queue=db.get("web:max_queue", 4),
+    max_streams=db.get("web:max_streams", 4),
+    max_long_polls=db.get("web:max_long_polls", 4),
+    max_body=db.get("web:max_body", 16384),
+    max_inflight=db.get("web:max_inflight", 65536),
+    header_timeout_ms=db.get("web:header_timeout_ms", 5000),
+    body_timeout_ms=db.get("web:body_timeout_ms", 10000),
+    handler_timeout_ms=db.get("web:handler_timeout_ms", 15000),
+    gzip_min_size=db.get("web:gzip_min", 512),
+)
 
 app.static("/", "/web")  # serve folder web
 
+# rate limit per IP: login (tebak password) dan endpoint yang memakai radio/bus
+auth_limit = RateLimiter(rate=0.2, burst=5)    # 5 percobaan, lalu 1 per 5 detik
+radio_limit = RateLimiter(rate=0.1, burst=2)   # scan WiFi/RS485, connect WiFi
+
 # ------------------------------------------------ #
 # basic
 
@@ -433,7 +514,7 @@ app.static("/", "/web")  # serve folder web
 # async def root(body, query, params):
 #     return {"message": "OK"}
 
-@app.post("/upload/:id")
+@app.post("/upload/:id", max_body=db.get("web:max_upload", 1048576), timeout_ms=120_000)
 async def upload_handler(body, query, params, files):
     print("Query:", query)
     print("Params:", params)
@@ -464,7 +545,7 @@ async def upload_handler(body, query, params, files):
 # ------------------------------------------------ #
 # auth
 
-@app.post("/api/auth/login")
+@app.post("/api/auth/login", limit=auth_limit)
 async def auth_login(body, query, params):
     if not body or not body.get("password"):
         return {"message": "Password required", "status": 400}
@@ -486,6 +567,8 @@ async def auth_login(body, query, params):
     return {"message": "Invalid password", "status": 401}
 
 def middleware_use_token(query):
+    if getattr(query, "authorized", False):
+        return None  # sub-request /api/batch, token sudah dicek sekali
     token = query.get("token")
     if not token:
         return {"message": "Token required", "status": 400}
@@ -493,6 +576,9 @@ def middleware_use_token(query):
         return {"message": "Invalid token", "status": 401}
     return None
 
+# beberapa panggilan dashboard dalam satu koneksi, token dicek sekali
+app.batch("/api/batch", auth=middleware_use_token)
+
 @app.get("/api/auth/token-validate")
 async def auth_token_validate(body, query, params):
     result = middleware_use_token(query)
@@ -526,7 +612,7 @@ async def auth_logout(body, query, params):
 # ------------------------------------------------ #
 # wifi
 
-@app.get("/api/wifi/list")
+@app.get("/api/wifi/list", limit=radio_limit)
 async def wifi_list(body, query, params):
     result = middleware_use_token(query)
     if result: return result
@@ -550,7 +636,7 @@ async def wifi_list(body, query, params):
         "ssid_connnected": wifi_sta_ssid_connected, # untuk hide list yang sudah terhubung
     }}
 
-@app.post("/api/wifi/connect")
+@app.post("/api/wifi/connect", timeout_ms=30_000, limit=radio_limit)
 async def wifi_connect(body, query, params):
     result = middleware_use_token(query)
     if result: return result
@@ -665,6 +751,214 @@ async def wifi_station_delete(body, query, params):
         print(f"Error removing network: {e}")
         return {"message": f"Error removing network: {str(e)}", "status": 500}
 
+# ------------------------------------------------ #
+# values
+
+# long-poll sampai 60 detik; delta kecil & sering, tidak dikompres
+@app.get("/api/values", timeout_ms=65_000, compress=False, long_poll=True)
+async def values_list(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+
+    try:
+        since = int(query.get("since", 0))
+        timeout = min(float(query.get("timeout", 25)), 60)
+    except ValueError:
+        return {"message": "since and timeout must be numbers", "status": 400}
+
+    # seq di depan store: device baru restart, kirim ulang semua channel
+    reset = since > data_value.seq
+    if reset:
+        since = 0
+    elif timeout > 0:
+        await data_value.wait(since, int(timeout * 1000))
+    return {"data": {
+        "seq": data_value.seq,
+        "reset": reset,
+        "values": data_value.snapshot(since),
+    }}
+
+def log_records(lines):
+    # baris log: "jam,seq,{json snapshot}" -> record; baris lain dilewati
+    for line in lines:
+        parts = line.split(",", 2)
+        if len(parts) < 3:
+            continue
+        try:
+            yield {"time": parts[0], "seq": int(parts[1]), "values": json.loads(parts[2])}
+        except ValueError:
+            continue
+
+@app.get("/api/log", stream=True)
+async def log_read(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    date = query.get("date") or (datetime and datetime["date"])
+    if not date or "/" in date or ".." in date:
+        return {"message": "date required", "status": 400}
+    try:
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+    except ValueError:
+        return {"message": "offset and limit must be numbers", "status": 400}
+    # di-stream per record, log sehari penuh tidak pernah dimuat ke RAM
+    return JSONStream(log_records(daily_log.lines(date, offset, limit)),
+                      envelope={"date": date, "offset": offset})
+
+@app.get("/api/stream", stream=True)
+async def values_stream(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+
+    try:
+        since = int(query.get("since", 0))
+    except ValueError:
+        return {"message": "since must be a number", "status": 400}
+    return EventStream(DeltaFeed(data_value, since), max_buffer=4096, heartbeat_ms=15000)
+
+# ------------------------------------------------ #
+# websocket (satu socket untuk nilai live + perintah cepat)
+
+ws_api = Dispatcher(auth=middleware_use_token)
+
+@ws_api.on("ping")
+async def ws_ping(ws, message):
+    return {"time": time.time()}
+
+@ws_api.on("values.get")
+async def ws_values_get(ws, message):
+    return {"seq": data_value.seq, "values": data_value.snapshot(message.get("since", 0))}
+
+@ws_api.on("values.subscribe")
+async def ws_values_subscribe(ws, message):
+    task = ws.state.pop("values", None)
+    if task:
+        task.cancel()
+    feed = DeltaFeed(data_value, message.get("since", 0),
+                     min_interval_ms=message.get("min_interval_ms", 200), kind="values")
+    ws.state["values"] = ws.spawn(feed.run(ws))
+    return {"seq": data_value.seq}
+
+@ws_api.on("values.unsubscribe")
+async def ws_values_unsubscribe(ws, message):
+    task = ws.state.pop("values", None)
+    if task:
+        task.cancel()
+    return {"subscribed": False}
+
+@ws_api.on("rs485.read")
+async def ws_rs485_read(ws, message):
+    if rs485_is_slave:
+        raise ValueError("RS485 is in slave mode")
+    readers = {
+        1: rs485.read_coils,
+        2: rs485.read_discrete_inputs,
+        3: rs485.read_holding_registers,
+        4: rs485.read_input_registers,
+    }
+    read = readers.get(message.get("function", 3))
+    if read is None:
+        raise ValueError("function must be 1-4")
+    return await read(message["slave"], message["address"], message.get("count", 1))
+
+@ws_api.on("rs485.write")
+async def ws_rs485_write(ws, message):
+    if rs485_is_slave:
+        raise ValueError("RS485 is in slave mode")
+    slave = message["slave"]
+    address = message["address"]
+    if "values" in message:
+        return await rs485.write_multiple_registers(slave, address, message["values"])
+    if "coil" in message:
+        return await rs485.write_single_coil(slave, address, message["coil"])
+    return await rs485.write_single_register(slave, address, message["value"])
+
+app.websocket("/api/ws")(ws_api.handle)
+
+# ------------------------------------------------ #
+# rs485
+
+@app.post("/api/rs485/scan", limit=radio_limit)
+async def rs485_scan_start(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+
+    if rs485_is_slave:
+        return {"message": "RS485 is in slave mode", "status": 409}
+
+    body = body or {}
+    if not isinstance(body, dict):
+        return {"message": "Body must be a JSON object", "status": 400}
+    mode = body.get("mode", "quick")
+    if mode not in ("quick", "full"):
+        return {"message": "Mode must be quick or full", "status": 400}
+    try:
+        start = int(body.get("start", 1))
+        end = int(body.get("end", 247))
+        combos = [(int(b), str(p)) for b, p in body.get("combos") or []]
+    except (ValueError, TypeError):
+        return {"message": "start, end and combos must be numbers", "status": 400}
+    if not 1 <= start <= end <= 247:
+        return {"message": "Address range must be within 1-247", "status": 400}
+
+    if not rs485_scanner.start(mode, start, end, combos):
+        return {"message": "Scan already running", "status": 409}
+    return {"message": "Scan started", "status": 202, "data": rs485_scanner.status()}
+
+@app.get("/api/rs485/scan")
+async def rs485_scan_status(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    return {"data": rs485_scanner.status()}
+
+@app.get("/api/rs485/stats")
+async def rs485_stats(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    stats = rs485.stats()
+    if rs485_poller is not None:
+        stats["poller"] = {
+            "transactions": rs485_poller.transactions,
+            "blocks": len(rs485_poller.blocks),
+        }
+    if rs485_slave is not None:
+        stats["slave"] = rs485_slave.stats
+    return {"data": stats}
+
+@app.delete("/api/rs485/stats")
+async def rs485_stats_reset(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    rs485.reset_stats()
+    return {"message": "Stats reset", "status": 200}
+
+@app.get("/api/metrics")
+async def web_metrics(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    if query.get("format") == "prometheus":
+        return {
+            "content": app.metrics.prometheus(app.load()),
+            "content_type": "text/plain; version=0.0.4",
+        }
+    data = app.metrics.to_dict()
+    data["server"] = app.load()
+    return {"data": data}
+
+@app.get("/api/web/stats")
+async def web_stats(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    return {"data": app.load()}
+
+@app.delete("/api/rs485/scan")
+async def rs485_scan_cancel(body, query, params):
+    result = middleware_use_token(query)
+    if result: return result
+    if not rs485_scanner.cancel():
+        return {"message": "No scan running", "status": 404}
+    return {"message": "Scan cancelled", "status": 200}
+
 # ------------------------------------------------ #
 
 @app.get("/*")
@@ -744,17 +1038,34 @@ async def worker_display():
                     display_render(0, 0, "STA: "+status)
                     display_render(1, 0, wifi_sta_ip_address)
                     await asyncio.sleep(1)
-#             if section == 3: # show all values
-#                 i = 0
-#                 while True:
-#                     if i == next_section_count:
-#                         section = section+1
-#                         break
-#                     i = i+1
-#                     ##
-#                     ##
-#                     await asyncio.sleep(1)
-#             if section == 4: # log stats
+            if section == 3: # rs485 stats
+                i = 0
+                while True:
+                    if i == next_section_count:
+                        section = section+1
+                        break
+                    i = i+1
+                    stats = rs485.stats()
+                    slaves = stats["slaves"].values()
+                    timeouts = sum(s["timeouts"] for s in slaves)
+                    crc_errors = sum(s["crc_errors"] for s in slaves)
+                    exceptions = sum(s["exceptions"] for s in slaves)
+                    display_render(0, 0, f"485 {stats['utilisation']['current_pct']}% {len(stats['slaves'])}sl")
+                    display_render(1, 0, f"T{timeouts} C{crc_errors} E{exceptions}")
+                    await asyncio.sleep(1)
+            if section == 4: # show all values
+                names = data_value.keys()
+                i = 0
+                while True:
+                    if i == next_section_count or not names:
+                        section = section+1
+                        break
+                    name = names[i % len(names)]
+                    i = i+1
+                    display_render(0, 0, name[:16])
+                    display_render(1, 0, str(round(data_value.get(name, 0), 2)))
+                    await asyncio.sleep(1)
+#             if section == 5: # log stats
 #                 i = 0
 #                 while True:
 #                     if i == next_section_count:
@@ -888,9 +1199,11 @@ async def worker_sdcard():
     mounted = False
     sd = None
     vfs = None
+    next_mount = 0
 
     while True:
-        if not mounted:
+        log_interval = db.get("log:interval", 1)
+        if not mounted and time.time() >= next_mount:
             # coba mount
             try:
                 print("Attempting to mount SD card…")
@@ -901,27 +1214,41 @@ async def worker_sdcard():
                 mounted = True
             except Exception as e:
                 print("Error mounting SD card:", e)
-                await led_error()
-                mounted = False
-                # tunggu dulu sebelum coba ulang
-                await asyncio.sleep(1)
-                continue  # ke loop selanjutnya
-        # jika sudah mounted, jalankan penulisan
-        try:
-            log_interval = db.get("log:interval", 1)
-            write_log("Hello SD card from ESP32-S3")
+                asyncio.create_task(led_error())
+                # tunggu dulu sebelum coba ulang, sampel tetap dicatat ke flash
+                next_mount = time.time() + 3
+            # pindahkan data yang tertampung di flash selama SD tidak ada
+            if mounted and spillover.pending():
+                try:
+                    spillover.drain(daily_log)
+                except Exception as e:
+                    print("Error draining spillover:", e)
+
+        # satu baris per interval: jam, seq terakhir, snapshot nilai terbaru;
+        # belum ada jam / channel -> tidak ada yang perlu dicatat
+        if not datetime or not len(data_value):
             await asyncio.sleep(log_interval)
-        except Exception as e:
-            print("Error during SD-card write:", e)
-            # bisa ada indikasi bahwa SD card dilepas → lakukan unmount & reset status
+            continue
+        value = f"{datetime['time']},{data_value.seq},{json.dumps(data_value.snapshot())}"
+        if mounted:
+            # jika sudah mounted, jalankan penulisan
             try:
-                os.umount("/sd")
-            except:
-                pass
-            mounted = False
-            # minta spi bus di-deinit atau reset jika perlu (bergantung library)
-            # lalu loop akan ulang mencoba mount
-            await asyncio.sleep(0.1)
+                write_log(value)
+            except Exception as e:
+                print("Error during SD-card write:", e)
+                # bisa ada indikasi bahwa SD card dilepas → lakukan unmount & reset status
+                daily_log.reset()
+                try:
+                    os.umount("/sd")
+                except:
+                    pass
+                mounted = False
+                # minta spi bus di-deinit atau reset jika perlu (bergantung library)
+                # lalu loop akan ulang mencoba mount
+                write_spillover(value)
+        else:
+            write_spillover(value)
+        await asyncio.sleep(log_interval)
 
 
 
@@ -932,9 +1259,38 @@ async def worker_webhook():
 
 
 
+def on_rs485_values(device, values):
+    for name, value in values.items():
+        data_value[f"{device}.{name}"] = value
+
+rs485_poller = None
 async def worker_rs485():
-    while True:
-        await asyncio.sleep(0.1)
+    global rs485_poller
+    if rs485_is_slave:
+        return
+    rs485_poller = PollScheduler(rs485, db.get("module:rs485", []),
+                                 on_values=on_rs485_values,
+                                 max_gap=db.get("rs485:max_gap", 4),
+                                 max_registers=db.get("rs485:max_registers", 64))
+    rs485_scanner.poller = rs485_poller
+    await rs485_poller.run()
+
+async def worker_modbus_tcp():
+    if rs485_is_slave or not db.get("modbus_tcp:enable", True):
+        return
+    gateway = ModbusTCPGateway(rs485, cache_ms=db.get("modbus_tcp:cache_ms", 500))
+    await gateway.serve(port=db.get("modbus_tcp:port", 502))
+
+
+
+async def worker_rs485_slave():
+    if rs485_slave is None:
+        return
+    if rs485_slave.start_irq():
+        print(f"RS485 slave 0x{rs485_slave.address:02X} (IRQ RX idle)")
+        return
+    print(f"RS485 slave 0x{rs485_slave.address:02X} (uasyncio)")
+    await rs485_slave.run()
 
 
 
@@ -955,6 +1311,9 @@ async def main():
         worker_datetime(),
         worker_i2c(),
         worker_sdcard(),
+        worker_rs485(),
+        worker_modbus_tcp(),
+        worker_rs485_slave(),
     )
 asyncio.run(main())
 
@@ -1,11 +1,693 @@
 import uasyncio as asyncio
+import binascii
+import hashlib
+import io
 import json
 import os
+import struct
+from array import array
+
+try:
+    import deflate
+except ImportError:
+    deflate = None
+    import zlib
+
+from ticks import ticks_ms, ticks_diff
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+STATUS_TEXT = {
+    101: "Switching Protocols",
+    200: "OK",
+    201: "Created",
+    202: "Accepted",
+    204: "No Content",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    408: "Request Timeout",
+    409: "Conflict",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class GzipEncoder:
+    """
+    Kompresor gzip bertahap dengan window kecil (2^wbits byte) supaya aman
+    untuk heap. Di MicroPython memakai deflate.DeflateIO, di CPython zlib.
+
+        gz = GzipEncoder()
+        out = gz.compress(data) + gz.finish()
+    """
+
+    def __init__(self, wbits=9):
+        if deflate is not None:
+            self._sink = io.BytesIO()
+            self._z = deflate.DeflateIO(self._sink, deflate.GZIP, wbits)
+        else:
+            self._sink = None
+            self._z = zlib.compressobj(6, zlib.DEFLATED, 16 + wbits)
+
+    # ============ PUBLIC ============
+    def compress(self, data):
+        """Hasil kompresi yang sudah siap dikirim (bisa kosong)."""
+        if self._sink is None:
+            return self._z.compress(data)
+        self._z.write(data)
+        return self._take()
+
+    def finish(self):
+        """Sisa data + trailer gzip."""
+        if self._sink is None:
+            return self._z.flush()
+        self._z.close()
+        return self._take()
+
+    # ============ PRIVATE ============
+    def _take(self):
+        # sink dipakai ulang dari awal; hanya sampai tell() yang valid
+        sink = self._sink
+        n = sink.tell()
+        if not n:
+            return b""
+        out = sink.getvalue()[:n]
+        sink.seek(0)
+        return out
+
+
+HTTP_LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+ROUTE_COUNTERS = ("requests", "status_1xx", "status_2xx", "status_3xx", "status_4xx", "status_5xx",
+                  "bytes_in", "bytes_out")
+_REQUESTS, _BYTES_IN, _BYTES_OUT = 0, 6, 7
+# key Router.load() yang berupa nilai saat ini; sisanya counter kumulatif
+_LOAD_GAUGES = ("active", "waiting", "streams", "long_polls", "inflight_bytes", "connections", "peak")
+
+
+class RouteMetrics:
+    """
+    Counter & histogram latency per route di array yang dialokasikan sekali.
+    Label route = pola route ("GET:/api/rs485/:id"), bukan path mentah, jadi
+    jumlahnya terbatas; route ke-`max_routes` dst digabung ke "other".
+    """
+
+    def __init__(self, max_routes=32):
+        self.max_routes = max_routes
+        self.labels = ["other"]
+        self._index = {"other": 0}
+        buckets = len(HTTP_LATENCY_BUCKETS_MS) + 1
+        self.counters = array("I", bytes(4 * len(ROUTE_COUNTERS) * max_routes))
+        self.histogram = array("I", bytes(4 * buckets * max_routes))
+        self.latency_sum_ms = array("I", bytes(4 * max_routes))
+        self.ttfb = array("I", bytes(4 * buckets))  # accept -> byte pertama respons, semua route
+        self.ttfb_sum_ms = 0
+
+    # ============ PUBLIC ============
+    def observe(self, label, status, bytes_in, bytes_out, latency_ms=None, ttfb_ms=None):
+        index = self._index.get(label)
+        if index is None:
+            index = 0
+            if len(self.labels) < self.max_routes:
+                index = self._index[label] = len(self.labels)
+                self.labels.append(label)
+        base = index * len(ROUTE_COUNTERS)
+        counters = self.counters
+        counters[base + _REQUESTS] += 1
+        if 100 <= status < 600:
+            counters[base + status // 100] += 1
+        counters[base + _BYTES_IN] += bytes_in
+        counters[base + _BYTES_OUT] += bytes_out
+        if latency_ms is not None:
+            self.histogram[index * (len(HTTP_LATENCY_BUCKETS_MS) + 1) + self._bucket(latency_ms)] += 1
+            self.latency_sum_ms[index] += latency_ms
+        if ttfb_ms is not None:
+            self.ttfb[self._bucket(ttfb_ms)] += 1
+            self.ttfb_sum_ms += ttfb_ms
+
+    def to_dict(self):
+        buckets = len(HTTP_LATENCY_BUCKETS_MS) + 1
+        routes = {}
+        for index, label in enumerate(self.labels):
+            base = index * len(ROUTE_COUNTERS)
+            route = {name: self.counters[base + i] for i, name in enumerate(ROUTE_COUNTERS)}
+            if not route["requests"]:
+                continue
+            route["latency_sum_ms"] = self.latency_sum_ms[index]
+            route["histogram"] = list(self.histogram[index * buckets:(index + 1) * buckets])
+            routes[label] = route
+        return {
+            "bounds_ms": list(HTTP_LATENCY_BUCKETS_MS),
+            "routes": routes,
+            "ttfb": {"sum_ms": self.ttfb_sum_ms, "histogram": list(self.ttfb)},
+        }
+
+    def prometheus(self, load=None):
+        """Format teks Prometheus (exposition 0.0.4); `load` = Router.load()."""
+        lines = []
+        buckets = len(HTTP_LATENCY_BUCKETS_MS) + 1
+        lines.append("# TYPE http_requests_total counter")
+        for index, label in enumerate(self.labels):
+            base = index * len(ROUTE_COUNTERS)
+            for code in range(1, 6):
+                if self.counters[base + code]:
+                    lines.append(f'http_requests_total{{route="{label}",code="{code}xx"}} {self.counters[base + code]}')
+        for name, i in (("http_request_bytes_total", _BYTES_IN), ("http_response_bytes_total", _BYTES_OUT)):
+            lines.append(f"# TYPE {name} counter")
+            for index, label in enumerate(self.labels):
+                value = self.counters[index * len(ROUTE_COUNTERS) + i]
+                if value:
+                    lines.append(f'{name}{{route="{label}"}} {value}')
+        lines.append("# TYPE http_request_duration_ms histogram")
+        for index, label in enumerate(self.labels):
+            if self.counters[index * len(ROUTE_COUNTERS) + _REQUESTS]:
+                self._histogram_lines(lines, "http_request_duration_ms", f'route="{label}",',
+                                      self.histogram[index * buckets:(index + 1) * buckets],
+                                      self.latency_sum_ms[index])
+        lines.append("# TYPE http_time_to_first_byte_ms histogram")
+        self._histogram_lines(lines, "http_time_to_first_byte_ms", "", self.ttfb, self.ttfb_sum_ms)
+        for name, value in (load or {}).items():
+            if name in _LOAD_GAUGES:
+                lines.append(f"# TYPE http_{name} gauge")
+                lines.append(f"http_{name} {value}")
+            else:
+                lines.append(f"# TYPE http_{name}_total counter")
+                lines.append(f"http_{name}_total {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+    # ============ PRIVATE ============
+    def _bucket(self, ms):
+        i = 0
+        for bound in HTTP_LATENCY_BUCKETS_MS:
+            if ms < bound:
+                break
+            i += 1
+        return i
+
+    def _histogram_lines(self, lines, name, labels, counts, total_ms):
+        cumulative = 0
+        for bound, count in zip(HTTP_LATENCY_BUCKETS_MS, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels[:-1]}}} {total_ms}" if labels else f"{name}_sum {total_ms}")
+        lines.append(f"{name}_count{{{labels[:-1]}}} {cumulative}" if labels else f"{name}_count {cumulative}")
+
+
+class JSONStream:
+    """
+    Respons JSON besar (list record) yang diserialisasi satu per satu
+    langsung ke socket dengan Transfer-Encoding: chunked, jadi memori yang
+    dipakai tetap (~`chunk_size`) berapa pun jumlah record-nya. `records`
+    boleh list, iterator, atau generator (dibaca sekali).
+
+    Contoh:
+        return JSONStream((row for row in rows), envelope={"date": date})
+        # -> {"date": "...", "data": [row, row, ...]}
+    """
+
+    def __init__(self, records, envelope=None, key="data", status=200, chunk_size=512):
+        self.records = records
+        self.envelope = envelope or {}
+        self.key = key
+        self.status = status
+        self.chunk_size = chunk_size
+        self.count = 0
+
+    def pieces(self):
+        """Potongan teks JSON berurutan: pembuka, tiap record, penutup."""
+        head = json.dumps(self.envelope)[:-1]
+        yield f'{head}{", " if self.envelope else ""}{json.dumps(self.key)}: ['
+        for record in self.records:
+            yield json.dumps(record) if not self.count else ", " + json.dumps(record)
+            self.count += 1
+        yield "]}"
+
+    def close(self):
+        # generator yang belum habis ditutup supaya file yang dibukanya ikut tertutup
+        if hasattr(self.records, "close"):
+            self.records.close()
+
+
+class StreamResponse:
+    """
+    Respons streaming berumur panjang. Handler mengembalikan objek ini dan
+    Router menulis header, lalu menjalankan `producer.run(response)` sebagai
+    task. Producer memanggil `response.write(data)` yang hanya menambah ke
+    buffer milik client (tidak pernah memblok); pengiriman ke socket
+    dilakukan loop terpisah. Client lambat yang buffernya melewati
+    `max_buffer` atau tidak selesai menerima dalam `write_timeout_ms`
+    diputus, bukan ditunggu.
+    """
+
+    def __init__(self, producer, content_type="application/octet-stream", headers=None,
+                 max_buffer=4096, write_timeout_ms=5000, heartbeat=None, heartbeat_ms=15000):
+        self.producer = producer
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.max_buffer = max_buffer
+        self.write_timeout_ms = write_timeout_ms
+        self.heartbeat = heartbeat
+        self.heartbeat_ms = heartbeat_ms
+        self.closed = False
+        self.dropped = False
+        self._buf = bytearray()
+        self._ready = asyncio.Event()
+
+    # ============ PUBLIC: Producer API ============
+    def write(self, data):
+        """Antrikan data ke client. False jika stream sudah ditutup / client terlalu lambat."""
+        if self.closed:
+            return False
+        if isinstance(data, str):
+            data = data.encode()
+        if len(self._buf) + len(data) > self.max_buffer:
+            print("Stream client too slow, dropping")
+            self.dropped = True
+            self._buf = bytearray()
+            self.close()
+            return False
+        self._buf.extend(data)
+        self._ready.set()
+        return True
+
+    def close(self):
+        """Tutup stream; data yang sudah diantrikan tetap dikirim dulu."""
+        self.closed = True
+        self._ready.set()
+
+    # ============ PRIVATE ============
+    async def _pump(self, writer):
+        # kirim isi buffer ke socket; heartbeat jika lama tidak ada data
+        while True:
+            if not self._buf:
+                if self.closed:
+                    break
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self.heartbeat_ms / 1000)
+                except asyncio.TimeoutError:
+                    if self.heartbeat:
+                        self._buf.extend(self.heartbeat)
+                self._ready.clear()
+                if not self._buf:
+                    continue
+            data = bytes(self._buf)
+            self._buf = bytearray()
+            writer.write(data)
+            await asyncio.wait_for(writer.drain(), self.write_timeout_ms / 1000)
+
+
+class EventStream(StreamResponse):
+    """
+    Server-Sent Events (text/event-stream) di atas StreamResponse.
+
+    Contoh:
+        class Clock:
+            async def run(self, stream):
+                while stream.event(str(time.time())):
+                    await asyncio.sleep(1)
+
+        @app.get("/api/clock")
+        async def clock(body, query, params):
+            return EventStream(Clock())
+    """
+
+    def __init__(self, producer, max_buffer=4096, write_timeout_ms=5000, heartbeat_ms=15000):
+        super().__init__(producer, "text/event-stream", {"Cache-Control": "no-cache"},
+                         max_buffer, write_timeout_ms, b":\n\n", heartbeat_ms)
+
+    def event(self, data, name=None, id=None, retry=None):
+        """Kirim satu event SSE (data multi-baris dipecah per baris)."""
+        lines = []
+        if id is not None:
+            lines.append(f"id: {id}")
+        if name is not None:
+            lines.append(f"event: {name}")
+        if retry is not None:
+            lines.append(f"retry: {retry}")
+        for line in str(data).split("\n"):
+            lines.append(f"data: {line}")
+        return self.write("\n".join(lines) + "\n\n")
+
+
+def _valid_close_code(code):
+    # RFC 6455 7.4: 1004-1006 & 1015 reserved, <1000 dan 1016-2999 tidak boleh dikirim
+    return 1000 <= code <= 1003 or 1007 <= code <= 1014 or 3000 <= code <= 4999
+
+
+class WebSocket(StreamResponse):
+    """
+    Koneksi WebSocket (RFC 6455) setelah handshake. Kirim lewat `send()`
+    (non-blocking, diantrikan ke buffer client seperti StreamResponse, jadi
+    client lambat diputus), terima lewat `await recv()`. Ping dari client
+    dijawab otomatis, heartbeat server berupa frame ping.
+    """
+
+    def __init__(self, reader, max_message=4096, max_buffer=8192, write_timeout_ms=5000, heartbeat_ms=20000):
+        super().__init__(None, max_buffer=max_buffer, write_timeout_ms=write_timeout_ms,
+                         heartbeat=b"\x89\x00", heartbeat_ms=heartbeat_ms)
+        self.reader = reader
+        self.max_message = max_message
+        self.state = {}    # data per koneksi untuk handler (mis. task subscription)
+        self._tasks = []
+        self._close_sent = False
+
+    # ============ PUBLIC ============
+    def send(self, data):
+        """Kirim pesan text (str) atau binary (bytes). False jika koneksi ditutup/lambat."""
+        if isinstance(data, str):
+            return self._send_frame(0x1, data.encode())
+        return self._send_frame(0x2, data)
+
+    def event(self, data, name=None, id=None, retry=None):
+        # kompatibel dengan producer EventStream (mis. telemetry.DeltaFeed)
+        return self.send(data)
+
+    def ping(self, data=b""):
+        return self._send_frame(0x9, data)
+
+    def close(self, code=1000, reason=""):
+        if not self._close_sent and not self.dropped:
+            self._close_sent = True
+            self._send_frame(0x8, struct.pack(">H", code) + reason.encode())
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        super().close()
+
+    def spawn(self, coro):
+        """Jalankan coroutine milik koneksi ini; dibatalkan otomatis saat koneksi ditutup."""
+        task = asyncio.create_task(coro)
+        self._tasks.append(task)
+        return task
+
+    async def recv(self):
+        """Pesan utuh berikutnya (str/bytes), None jika koneksi ditutup."""
+        message = None
+        text = False
+        while not self.closed:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (EOFError, OSError):
+                # koneksi putus: 1006 hanya untuk dilaporkan, tidak boleh dikirim
+                self.dropped = True
+                self.close()
+                return None
+            if payload is None:
+                return None
+            if opcode == 0x8:
+                # close dari client: balas close lalu selesai
+                if not payload:
+                    self.close(1000)
+                    return None
+                code = struct.unpack(">H", payload[:2])[0] if len(payload) >= 2 else 0
+                if not _valid_close_code(code):
+                    self.close(1002, "invalid close code")
+                    return None
+                try:
+                    bytes(payload[2:]).decode()
+                except UnicodeError:
+                    self.close(1007, "invalid utf-8")
+                    return None
+                self.close(code)
+                return None
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            if opcode in (0x1, 0x2):
+                if message is not None:
+                    self.close(1002, "expected continuation")
+                    return None
+                message = payload
+                text = opcode == 0x1
+            elif opcode == 0x0 and message is not None:
+                if len(message) + len(payload) > self.max_message:
+                    self.close(1009, "message too big")
+                    return None
+                message.extend(payload)
+            else:
+                self.close(1002, "unexpected opcode")
+                return None
+            if fin:
+                if text:
+                    try:
+                        return message.decode()
+                    except UnicodeError:
+                        self.close(1007, "invalid utf-8")
+                        return None
+                return bytes(message)
+        return None
+
+    # ============ PRIVATE ============
+    def _send_frame(self, opcode, payload):
+        n = len(payload)
+        if n < 126:
+            header = struct.pack(">BB", 0x80 | opcode, n)
+        elif n < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+        return self.write(header + payload)
+
+    async def _read_frame(self):
+        reader = self.reader
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack(">H", await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack(">Q", await reader.readexactly(8))[0]
+        if not b1 & 0x80:
+            self.close(1002, "frame not masked")
+            return 0, 0, None
+        if b0 & 0x08 and (n > 125 or not b0 & 0x80):
+            # frame kontrol tidak boleh terfragmentasi / lebih dari 125 byte
+            self.close(1002, "invalid control frame")
+            return 0, 0, None
+        if n > self.max_message:
+            self.close(1009, "message too big")
+            return 0, 0, None
+        mask = await reader.readexactly(4)
+        payload = bytearray(await reader.readexactly(n)) if n else bytearray()
+        for i in range(n):
+            payload[i] ^= mask[i & 3]
+        return b0 & 0x80, b0 & 0x0F, payload
+
+
+class Dispatcher:
+    """
+    API pesan JSON di atas WebSocket. Client mengirim
+    `{"id": 1, "type": "rs485.read", ...}` dan menerima
+    `{"id": 1, "ok": true, "data": ...}` (atau `"ok": false, "error"`).
+    Push dari server (mis. subscription) dikirim lewat `ws.send()` biasa.
+
+    Contoh:
+        api = Dispatcher(auth=middleware_use_token)
+
+        @api.on("ping")
+        async def ping(ws, message):
+            return "pong"
+
+        app.websocket("/api/ws")(api.handle)
+    """
+
+    def __init__(self, auth=None):
+        """
+        Args:
+            auth: Fungsi `auth(query)` -> dict error atau None (seperti middleware token)
+        """
+        self.auth = auth
+        self.handlers = {}
+
+    def on(self, message_type):
+        def decorator(handler):
+            self.handlers[message_type] = handler
+            return handler
+        return decorator
+
+    async def handle(self, ws, query, params):
+        if self.auth is not None:
+            error = self.auth(query)
+            if error:
+                ws.send(json.dumps({"type": "error", "error": error.get("message"), "status": error.get("status")}))
+                ws.close(1008, "unauthorized")
+                return
+        while True:
+            message = await ws.recv()
+            if message is None:
+                break
+            try:
+                request = json.loads(message)
+                reply = {"id": request.get("id")}
+            except (ValueError, AttributeError):
+                ws.send(json.dumps({"ok": False, "error": "invalid JSON"}))
+                continue
+            handler = self.handlers.get(request.get("type"))
+            if handler is None:
+                reply["ok"] = False
+                reply["error"] = f"unknown type {request.get('type')}"
+            else:
+                try:
+                    reply["data"] = await handler(ws, request)
+                    reply["ok"] = True
+                except Exception as e:
+                    reply["ok"] = False
+                    reply["error"] = str(e)
+            ws.send(json.dumps(reply))
+
+
+class BatchQuery(dict):
+    """
+    Query sub-request /api/batch. `authorized` hanya True jika fungsi auth
+    batch benar-benar sudah dijalankan (dan lolos) untuk request induknya.
+    """
+    def __init__(self, values, authorized=False):
+        super().__init__(values)
+        self.authorized = authorized
+
+
+class RateLimiter:
+    """
+    Token bucket per IP client dalam tabel ukuran tetap. Satu limiter bisa
+    dipasang ke beberapa route sekaligus (satu grup berbagi kuota).
+    Jika tabel penuh, IP yang paling lama tidak terlihat digusur.
+
+    Contoh:
+        login_limit = RateLimiter(rate=0.2, burst=5)   # 5 percobaan, lalu 1 per 5 detik
+        @app.post("/api/auth/login", limit=login_limit)
+    """
+
+    def __init__(self, rate, burst, size=16):
+        """
+        Args:
+            rate: Token yang diisi ulang per detik
+            burst: Kapasitas bucket (request beruntun maksimal)
+            size: Jumlah IP yang dilacak
+        """
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        self._slots = {}  # ip -> index
+        self._ips = [None] * size
+        self._tokens = array("f", [burst] * size)
+        self._seen = array("I", bytes(4 * size))  # ticks_ms terakhir (untuk refill + LRU)
+        self.throttled = 0
+        self.evicted = 0
+
+    # ============ PUBLIC ============
+    def allow(self, ip, cost=1):
+        """0 jika diizinkan, selain itu detik sampai token cukup (untuk Retry-After)."""
+        now = ticks_ms() & 0x3FFFFFFF
+        index = self._slots.get(ip)
+        if index is None:
+            index = self._evict()
+            self._ips[index] = ip
+            self._slots[ip] = index
+            tokens = self.burst
+        else:
+            elapsed = ticks_diff(now, self._seen[index])
+            tokens = min(self.burst, self._tokens[index] + elapsed * self.rate / 1000)
+        self._seen[index] = now
+        if tokens < cost:
+            self._tokens[index] = tokens
+            self.throttled += 1
+            return int((cost - tokens) / self.rate) + 1
+        self._tokens[index] = tokens - cost
+        return 0
+
+    # ============ PRIVATE ============
+    def _evict(self):
+        ips = self._ips
+        for index in range(self.size):
+            if ips[index] is None:
+                return index
+        now = ticks_ms() & 0x3FFFFFFF
+        oldest = 0
+        for index in range(1, self.size):
+            if ticks_diff(now, self._seen[index]) > ticks_diff(now, self._seen[oldest]):
+                oldest = index
+        del self._slots[ips[oldest]]
+        self.evicted += 1
+        return oldest
+
 
 class Router:
-    def __init__(self):
+    def __init__(self, max_connections=8, max_queue=4, queue_timeout_ms=2000, max_streams=4,
+                 max_body=16384, max_inflight=65536, max_header=4096, retry_after=2,
+                 header_timeout_ms=5000, body_timeout_ms=10000, min_body_rate=2048,
+                 handler_timeout_ms=15000, write_timeout_ms=5000, gzip_min_size=512, gzip_wbits=9,
+                 max_metric_routes=32, max_long_polls=4):
+        """
+        Args:
+            max_connections: Request HTTP yang diproses bersamaan
+            max_queue: Koneksi yang boleh antri menunggu slot (sisanya langsung 503)
+            queue_timeout_ms: Lama antri maksimal sebelum dijawab 503
+            max_streams: Koneksi SSE/WebSocket aktif maksimal (tidak memakai slot request)
+            max_body: Ukuran body default per request (bisa diganti per route)
+            max_inflight: Total body semua request yang sedang dibaca ke RAM
+            max_header: Ukuran header request maksimal
+            retry_after: Nilai header Retry-After (detik) untuk 503
+            header_timeout_ms: Batas waktu sejak koneksi diterima sampai header lengkap
+            body_timeout_ms: Batas waktu dasar membaca body, ditambah waktu transfer
+                             body pada kecepatan `min_body_rate` (byte/detik)
+            handler_timeout_ms: Batas waktu handler (bisa diganti per route), lewat -> dibatalkan, 504
+            write_timeout_ms: Batas waktu mengirim respons ke client
+            gzip_min_size: Respons dinamis (JSON/teks) sebesar ini ke atas dikompres gzip
+                           jika client mengirim Accept-Encoding: gzip (None = mati)
+            gzip_wbits: Ukuran window kompresi (2^wbits byte)
+            max_metric_routes: Jumlah label route yang dilacak di `metrics`
+            max_long_polls: Long-poll yang boleh menunggu bersamaan (tidak memakai slot request)
+        """
         self.routes = {}
         self.static_routes = {}
+        self.ws_routes = {}
+        self.body_limits = {}
+        self.handler_timeouts = {}
+        self.rate_limits = {}
+        self.compress_routes = {}
+        self.batch_routes = {}
+        self.long_poll_routes = {}
+        self.stream_routes = {}
+        self.max_connections = max_connections
+        self.max_queue = max_queue
+        self.queue_timeout_ms = queue_timeout_ms
+        self.max_streams = max_streams
+        self.max_long_polls = max_long_polls
+        self.max_body = max_body
+        self.max_inflight = max_inflight
+        self.max_header = max_header
+        self.retry_after = retry_after
+        self.header_timeout_ms = header_timeout_ms
+        self.body_timeout_ms = body_timeout_ms
+        self.min_body_rate = min_body_rate
+        self.handler_timeout_ms = handler_timeout_ms
+        self.write_timeout_ms = write_timeout_ms
+        self.gzip_min_size = gzip_min_size
+        self.gzip_wbits = gzip_wbits
+        self.metrics = RouteMetrics(max_metric_routes)
+        self.connections = 0  # koneksi TCP terbuka (termasuk antri & stream)
+        self.active = 0
+        self.streams = 0
+        self.polls = 0
+        self.inflight = 0
+        self._waiters = []  # Event koneksi yang antri, FIFO
+        self.stats = {
+            "accepted": 0, "queued": 0, "peak": 0,
+            "shed_queue_full": 0, "shed_queue_timeout": 0, "shed_streams": 0,
+            "shed_long_polls": 0,
+            "rejected_body": 0, "rejected_inflight": 0, "rejected_header": 0,
+            "timeout_header": 0, "timeout_body": 0, "timeout_handler": 0, "timeout_write": 0,
+            "throttled": 0, "gzip": 0, "gzip_saved_bytes": 0,
+        }
 
         # pastikan ada folder tmp
         try:
@@ -15,33 +697,66 @@ class Router:
             pass
 
     # ============ PUBLIC: Routing API ============
-    def get(self, path):
+    def get(self, path, timeout_ms=None, limit=None, compress=None, long_poll=False, stream=False):
+        """
+        `long_poll=True`: handler boleh lama menunggu data; selama itu slot
+        request dilepas dan koneksi memakai kuota `max_long_polls`.
+        `stream=True`: handler mengembalikan JSONStream/StreamResponse.
+        Keduanya tidak bisa dipanggil lewat batch.
+        """
+        def decorator(handler):
+            self._add_route("GET", path, handler, timeout_ms=timeout_ms, limit=limit, compress=compress)
+            if long_poll:
+                self.long_poll_routes[f"GET:{path}"] = True
+            if stream:
+                self.stream_routes[f"GET:{path}"] = True
+            return handler
+        return decorator
+
+    def post(self, path, max_body=None, timeout_ms=None, limit=None, compress=None):
         def decorator(handler):
-            self._add_route("GET", path, handler)
+            self._add_route("POST", path, handler, max_body, timeout_ms, limit, compress)
             return handler
         return decorator
 
-    def post(self, path):
+    def put(self, path, max_body=None, timeout_ms=None, limit=None, compress=None):
         def decorator(handler):
-            self._add_route("POST", path, handler)
+            self._add_route("PUT", path, handler, max_body, timeout_ms, limit, compress)
             return handler
         return decorator
 
-    def put(self, path):
+    def patch(self, path, max_body=None, timeout_ms=None, limit=None, compress=None):
         def decorator(handler):
-            self._add_route("PUT", path, handler)
+            self._add_route("PATCH", path, handler, max_body, timeout_ms, limit, compress)
             return handler
         return decorator
 
-    def patch(self, path):
+    def delete(self, path, timeout_ms=None, limit=None, compress=None):
         def decorator(handler):
-            self._add_route("PATCH", path, handler)
+            self._add_route("DELETE", path, handler, timeout_ms=timeout_ms, limit=limit, compress=compress)
             return handler
         return decorator
 
-    def delete(self, path):
+    def batch(self, path, auth=None, max_requests=8, timeout_ms=30000):
+        """
+        Route POST `path` yang menjalankan beberapa sub-request lewat tabel
+        route yang sama dalam satu koneksi. Body:
+            {"requests": [{"method": "GET", "path": "/api/wifi/list", "query": {}, "body": null}, ...]}
+        Respons: {"data": [{"status": 200, "body": {...}}, ...]} (urutan sama).
+
+        Args:
+            auth: Fungsi `auth(query)` -> dict error atau None, dijalankan sekali.
+                  Jika ada, sub-request menerima query BatchQuery (authorized = True)
+                  berisi token yang sama; tanpa auth tiap sub-request cek sendiri.
+            max_requests: Jumlah sub-request maksimal per batch
+        """
+        self.batch_routes[path] = (auth, max_requests)
+        self.handler_timeouts[f"POST:{path}"] = timeout_ms
+
+    def websocket(self, path):
+        """Route WebSocket: handler `async def handler(ws, query, params)`."""
         def decorator(handler):
-            self._add_route("DELETE", path, handler)
+            self.ws_routes[path] = handler
             return handler
         return decorator
 
@@ -62,10 +777,30 @@ class Router:
         loop.create_task(self._start_server(host, port, callback))
         loop.run_forever()
 
+    def load(self):
+        """Counter admission control + beban saat ini."""
+        stats = dict(self.stats)
+        stats["active"] = self.active
+        stats["waiting"] = len(self._waiters)
+        stats["streams"] = self.streams
+        stats["long_polls"] = self.polls
+        stats["inflight_bytes"] = self.inflight
+        stats["connections"] = self.connections
+        return stats
+
     # ============ PRIVATE: Routing Core ============
-    def _add_route(self, method, path, handler):
+    def _add_route(self, method, path, handler, max_body=None, timeout_ms=None, limit=None,
+                   compress=None):
         key = f"{method}:{path}"
         self.routes[key] = handler
+        if max_body is not None:
+            self.body_limits[key] = max_body
+        if timeout_ms is not None:
+            self.handler_timeouts[key] = timeout_ms
+        if limit is not None:
+            self.rate_limits[key] = limit
+        if compress is not None:
+            self.compress_routes[key] = compress
 
     def _match_path_params(self, route_path, request_path):
         route_parts = [p for p in route_path.split('/') if p]
@@ -136,6 +871,7 @@ class Router:
                         "content": content,
                         "status": 200,
                         "content_type": self._guess_content_type(file_path),
+                        "static": True,
                     }
                 except OSError:
                     # File not found, continue to dynamic routes
@@ -183,6 +919,87 @@ class Router:
         return {"error": "Not Found 2", "status": 404}
 
 
+    # ============ PRIVATE: Batch ============
+    async def _handle_batch(self, batch_path, body, query, ip):
+        auth, max_requests = self.batch_routes[batch_path]
+        authorized = False
+        if auth is not None:
+            error = auth(query)
+            if error:
+                return error
+            authorized = True
+        requests = body.get("requests") if isinstance(body, dict) else body
+        if not isinstance(requests, list) or not requests:
+            return {"message": "requests must be a non-empty list", "status": 400}
+        if len(requests) > max_requests:
+            return {"message": f"Max {max_requests} requests per batch", "status": 413}
+        # berurutan: sub-request boleh bergantung pada efek sub-request sebelumnya
+        results = []
+        for sub in requests:
+            try:
+                results.append(await self._batch_call(sub, query, ip, authorized))
+            except Exception as e:
+                print("Batch error:", e)
+                results.append({"status": 500, "body": {"message": str(e)}})
+        return {"data": results}
+
+    async def _batch_call(self, sub, outer_query, ip, authorized=False):
+        if not isinstance(sub, dict) or not isinstance(sub.get("path"), str):
+            return {"status": 400, "body": {"message": "path required"}}
+        method = str(sub.get("method", "GET")).upper()
+        path = sub["path"]
+        if path in self.batch_routes:
+            return {"status": 400, "body": {"message": "Nested batch not allowed"}}
+        if self._route_option(self.long_poll_routes, method, path, False) or \
+                self._route_option(self.stream_routes, method, path, False):
+            return {"status": 400, "body": {"message": "Streaming route cannot be batched"}}
+        body = sub.get("body")
+        max_body = self._route_option(self.body_limits, method, path, None)
+        if max_body is not None and body is not None and len(json.dumps(body)) > max_body:
+            return {"status": 413, "body": {"message": "Payload too large"}}
+        query = BatchQuery(sub.get("query") or {}, authorized)
+        if "token" in outer_query:
+            query["token"] = outer_query["token"]
+
+        limiter = self._route_option(self.rate_limits, method, path, None)
+        if limiter is not None:
+            retry_after = limiter.allow(ip)
+            if retry_after:
+                self.stats["throttled"] += 1
+                return {"status": 429, "body": {"message": "Too many requests", "retry_after": retry_after}}
+
+        timeout_ms = self._route_option(self.handler_timeouts, method, path, self.handler_timeout_ms)
+        try:
+            result = await asyncio.wait_for(self._handle_request(method, path, body, query, {}),
+                                            timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            self.stats["timeout_handler"] += 1
+            print(f"Handler timeout: {method} {path} (batch)")
+            return {"status": 504, "body": {"message": "Handler timeout"}}
+
+        # route yang tidak ditandai stream=True tapi tetap mengembalikan stream
+        if isinstance(result, (JSONStream, StreamResponse)):
+            result.close()
+            return {"status": 400, "body": {"message": "Streaming route cannot be batched"}}
+        if isinstance(result, dict) and "content" in result:
+            status = result.get("status", 200)
+            content = result["content"]
+        elif isinstance(result, tuple):
+            content, status = result[0], result[1]
+        elif isinstance(result, (bytes, str)):
+            content, status = result, 200
+        else:
+            data = {k: v for k, v in result.items() if k != "status"}
+            return {"status": result.get("status", 200), "body": data}
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", "ignore")
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                pass
+        return {"status": status, "body": content}
+
     # ============ PRIVATE: HTTP Parsing ============
     def _parse_http_request(self, request_data):
         if not request_data:
@@ -293,15 +1110,215 @@ class Router:
             data += chunk
             if b"\r\n\r\n" in data:
                 break
+            if len(data) > self.max_header:
+                return None
         return data
 
+    async def _read_body(self, reader, content_length):
+        body_bytes = b""
+        while len(body_bytes) < content_length:
+            chunk = await reader.read(content_length - len(body_bytes))
+            if not chunk:
+                break
+            body_bytes += chunk
+        return body_bytes
+
+    # ============ PRIVATE: Admission Control ============
+    async def _admit(self):
+        """Ambil slot request; antri jika penuh. False jika harus ditolak."""
+        if self.active < self.max_connections and not self._waiters:
+            self._take_slot()
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.stats["shed_queue_full"] += 1
+            return False
+        event = asyncio.Event()
+        self._waiters.append(event)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(event.wait(), self.queue_timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            if event in self._waiters:
+                self._waiters.remove(event)
+                self.stats["shed_queue_timeout"] += 1
+                return False
+        # slot sudah dipindahkan oleh _release_slot
+        return True
+
+    def _take_slot(self):
+        self.active += 1
+        self.stats["accepted"] += 1
+        if self.active > self.stats["peak"]:
+            self.stats["peak"] = self.active
+
+    def _release_slot(self):
+        # slot langsung diwariskan ke koneksi antrian terdepan
+        if self._waiters:
+            self.stats["accepted"] += 1
+            self._waiters.pop(0).set()
+        else:
+            self.active -= 1
+
+    def _route_key(self, method, path):
+        """Pola route yang cocok ("GET:/api/x/:id") untuk label metrics, atau "unmatched"."""
+        key = f"{method}:{path}"
+        if key in self.routes or (method == "POST" and path in self.batch_routes):
+            return key
+        for route_key in self.routes:
+            route_method, route_path = route_key.split(":", 1)
+            if route_method == method and not route_path.endswith("*") and \
+                    self._match_path_params(route_path, path) is not None:
+                return route_key
+        for route_key in self.routes:
+            route_method, route_path = route_key.split(":", 1)
+            if route_method == method and self._match_path_params(route_path, path) is not None:
+                return route_key
+        return "unmatched"
+
+    def _route_option(self, options, method, path, default):
+        """Nilai per-route dari `options` (body_limits/handler_timeouts), atau `default`."""
+        for key, value in options.items():
+            route_method, route_path = key.split(":", 1)
+            if route_method == method and self._match_path_params(route_path, path) is not None:
+                return value
+        return default
+
+    async def _reject(self, conn, reader, writer, status, message, retry_after=None):
+        content = json.dumps({"message": message}).encode()
+        header = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+        )
+        if retry_after is not None:
+            header += f"Retry-After: {retry_after}\r\n"
+        data = (header + "Connection: close\r\n\r\n").encode() + content
+        conn["status"] = status
+        conn["bytes_out"] = len(data)
+        self._first_byte(conn)
+        try:
+            writer.write(data)
+            await writer.drain()
+            # buang sedikit request yang belum dibaca supaya close tidak jadi RST
+            # (RST bisa membuat client kehilangan respons di atas)
+            await asyncio.wait_for(reader.read(1024), 0.1)
+        except Exception:
+            pass
+        await self._close(writer)
+
+    def _accepts_gzip(self, header_str, method, path):
+        if self.gzip_min_size is None:
+            return False
+        for line in header_str.split("\r\n"):
+            if line.lower().startswith("accept-encoding:"):
+                if "gzip" in line.lower():
+                    return self._route_option(self.compress_routes, method, path, True)
+                return False
+        return False
+
+
+    def _peer_ip(self, writer):
+        try:
+            peer = writer.get_extra_info("peername")
+        except Exception:
+            return None
+        if isinstance(peer, tuple):
+            return peer[0]
+        # MicroPython: sockaddr mentah (len, family, port, addr); port berbeda
+        # tiap koneksi, jadi kuncinya hanya 4 byte alamat IPv4
+        if isinstance(peer, (bytes, bytearray)) and len(peer) >= 8:
+            return bytes(peer[4:8])
+        return peer
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
     # ============ PRIVATE: Client Handler ============
     async def _handle_client(self, reader, writer):
+        # conn: state per koneksi, sekaligus catatan untuk metrics
+        conn = {"slot": False, "t0": ticks_ms(), "label": "rejected", "status": 0,
+                "bytes_in": 0, "bytes_out": 0, "ttfb": None, "stream": False}
+        self.connections += 1
+        try:
+            # tolak sebelum membaca apa pun jika server penuh
+            if not await self._admit():
+                await self._reject(conn, reader, writer, 503, "Server busy", self.retry_after)
+                return
+            conn["slot"] = True
+            try:
+                await self._serve(reader, writer, conn)
+            finally:
+                if conn["slot"]:
+                    self._release_slot()
+        finally:
+            self.connections -= 1
+            if conn["status"]:
+                latency = None if conn["stream"] else ticks_diff(ticks_ms(), conn["t0"])
+                self.metrics.observe(conn["label"], conn["status"], conn["bytes_in"],
+                                     conn["bytes_out"], latency, conn["ttfb"])
+
+    def _first_byte(self, conn):
+        if conn["ttfb"] is None:
+            conn["ttfb"] = ticks_diff(ticks_ms(), conn["t0"])
+
+    def _detach(self, conn):
+        """Koneksi jadi stream berumur panjang: lepas slot request, pakai kuota stream."""
+        if self.streams >= self.max_streams:
+            self.stats["shed_streams"] += 1
+            return False
+        conn["slot"] = False
+        conn["stream"] = True
+        self._release_slot()
+        self.streams += 1
+        self._first_byte(conn)
+        return True
+
+    def _park(self, conn):
+        """Long-poll: lepas slot request selama menunggu, pakai kuota long-poll."""
+        if self.polls >= self.max_long_polls:
+            self.stats["shed_long_polls"] += 1
+            return False
+        if conn["slot"]:
+            conn["slot"] = False
+            self._release_slot()
+        conn["stream"] = True  # lama tunggu bukan latency server
+        self.polls += 1
+        return True
+
+    async def _serve(self, reader, writer, conn):
         tmp_files = []
+        reserved = 0
         try:
-            # baca header manual
-            request_header = await self._read_headers(reader)
+            # baca header manual (client yang mengirim byte per byte tidak boleh menahan slot)
+            try:
+                request_header = await asyncio.wait_for(self._read_headers(reader),
+                                                        self.header_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                self.stats["timeout_header"] += 1
+                await self._reject(conn, reader, writer, 408, "Request header timeout")
+                return
+            if request_header is None:
+                self.stats["rejected_header"] += 1
+                await self._reject(conn, reader, writer, 431, "Request header too large")
+                return
             header_str = request_header.decode("utf-8", "ignore")
+            conn["bytes_in"] = len(request_header)
+
+            if "\r\nupgrade: websocket" in header_str.lower():
+                conn["label"] = "websocket"
+                conn["status"] = 101
+                if not self._detach(conn):
+                    await self._reject(conn, reader, writer, 503, "Too many streams", self.retry_after)
+                    return
+                try:
+                    await self._handle_websocket(reader, writer, header_str, conn)
+                finally:
+                    self.streams -= 1
+                return
 
             # cari content-length
             content_length = 0
@@ -309,19 +1326,92 @@ class Router:
                 if line.lower().startswith("content-length:"):
                     content_length = int(line.split(":", 1)[1].strip())
 
-            # baca body sesuai content-length
-            body_bytes = b""
-            while len(body_bytes) < content_length:
-                chunk = await reader.read(content_length - len(body_bytes))
-                if not chunk:
-                    break
-                body_bytes += chunk
+            # batas body dicek sebelum body dibaca ke RAM
+            request_line = header_str.split("\r\n", 1)[0].split(" ")
+            route = (request_line[0], request_line[1].split("?", 1)[0]) if len(request_line) > 1 else None
+            if route:
+                conn["label"] = self._route_key(route[0], route[1])
+            if route and self.rate_limits:
+                # dicek sebelum body dibaca/di-parse dan sebelum handler menyentuh flash/radio
+                limiter = self._route_option(self.rate_limits, route[0], route[1], None)
+                if limiter is not None:
+                    retry_after = limiter.allow(self._peer_ip(writer))
+                    if retry_after:
+                        self.stats["throttled"] += 1
+                        await self._reject(conn, reader, writer, 429, "Too many requests", retry_after)
+                        return
+            if route:
+                limit = self._route_option(self.body_limits, route[0], route[1], self.max_body)
+                if content_length > limit:
+                    self.stats["rejected_body"] += 1
+                    await self._reject(conn, reader, writer, 413, f"Body larger than {limit} bytes")
+                    return
+            # satu request boleh melebihi max_inflight (mis. upload) asal sendirian
+            if self.inflight and self.inflight + content_length > self.max_inflight:
+                self.stats["rejected_inflight"] += 1
+                await self._reject(conn, reader, writer, 503, "Server busy", self.retry_after)
+                return
+            reserved = content_length
+            self.inflight += reserved
 
+            # baca body sesuai content-length, batas waktu ikut ukuran body
+            body_timeout_ms = self.body_timeout_ms + content_length * 1000 // self.min_body_rate
+            try:
+                body_bytes = await asyncio.wait_for(self._read_body(reader, content_length),
+                                                    body_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                self.stats["timeout_body"] += 1
+                await self._reject(conn, reader, writer, 408, "Request body timeout")
+                return
+
+            conn["bytes_in"] += len(body_bytes)
             request = request_header + body_bytes
             method, path, body, query_params, files = self._parse_http_request(request)
             tmp_files = [info["path"] for info in files.values()]
+            del request, body_bytes
+
+            # handler yang melewati batas dibatalkan (CancelledError di dalam handler)
+            handler_timeout_ms = self._route_option(self.handler_timeouts, method, path,
+                                                    self.handler_timeout_ms)
+            long_poll = self._route_option(self.long_poll_routes, method, path, False)
+            if long_poll and not self._park(conn):
+                await self._reject(conn, reader, writer, 503, "Too many long-polls", self.retry_after)
+                return
+            if method == "POST" and path in self.batch_routes:
+                call = self._handle_batch(path, body, query_params, self._peer_ip(writer))
+            else:
+                call = self._handle_request(method, path, body, query_params, files)
+            try:
+                result = await asyncio.wait_for(call, handler_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                self.stats["timeout_handler"] += 1
+                print(f"Handler timeout: {method} {path}")
+                # 504 tanpa Retry-After: route macet, bukan server kelebihan beban (503)
+                await self._reject(conn, reader, writer, 504, "Handler timeout")
+                return
+            finally:
+                if long_poll:
+                    self.polls -= 1
+
+            gzip = self._accepts_gzip(header_str, method, path)
+            if isinstance(result, JSONStream):
+                conn["status"] = result.status
+                self._first_byte(conn)
+                conn["bytes_out"] = await self._send_json_stream(writer, result, gzip)
+                return
 
-            result = await self._handle_request(method, path, body, query_params, files)
+            if isinstance(result, StreamResponse):
+                conn["status"] = 200
+                self.inflight -= reserved
+                reserved = 0
+                if not self._detach(conn):
+                    await self._reject(conn, reader, writer, 503, "Too many streams", self.retry_after)
+                    return
+                try:
+                    await self._send_stream(writer, result)
+                finally:
+                    self.streams -= 1
+                return
 
             # Handle different types of handler returns
             if isinstance(result, dict) and "content" in result:
@@ -329,6 +1419,9 @@ class Router:
                 content = result["content"]
                 status_code = result.get("status", 200)
                 content_type = result.get("content_type", "application/octet-stream")
+                if result.get("static"):
+                    gzip = False
+                    conn["label"] = "static"
                 if isinstance(content, str):
                     content = content.encode()
             elif isinstance(result, bytes):
@@ -364,23 +1457,44 @@ class Router:
                 status_code = result.get("status", 200)
                 content_type = "application/json"
 
-            status_text = "OK" if status_code == 200 else \
-                          "Bad Request" if status_code == 400 else \
-                          "Not Found" if status_code == 404 else \
-                          "Internal Server Error"
+            status_text = STATUS_TEXT.get(status_code, "Internal Server Error")
+
+            conn["status"] = status_code
+            if gzip and len(content) >= self.gzip_min_size and \
+                    (content_type.startswith("application/json") or content_type.startswith("text/")):
+                http_header = (
+                    f"HTTP/1.1 {status_code} {status_text}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    "Content-Encoding: gzip\r\nVary: Accept-Encoding\r\n"
+                    "Transfer-Encoding: chunked\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+                self._first_byte(conn)
+                conn["bytes_out"] = await self._send_gzip(writer, http_header, content)
+                return
 
-            http_response = (
+            http_header = (
                 f"HTTP/1.1 {status_code} {status_text}\r\n"
                 f"Content-Type: {content_type}\r\n"
                 f"Content-Length: {len(content)}\r\n"
                 "Connection: close\r\n\r\n"
-            ).encode() + content
+            ).encode()
 
-            await writer.awrite(http_response)
-            await writer.aclose()
+            conn["bytes_out"] = len(http_header) + len(content)
+            self._first_byte(conn)
+            try:
+                # header & body ditulis terpisah, tanpa menyalin body ke buffer baru
+                writer.write(http_header)
+                writer.write(content)
+                await asyncio.wait_for(writer.drain(), self.write_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                self.stats["timeout_write"] += 1
+            await self._close(writer)
         except Exception as e:
             print("handle_client Error:", e)
+            await self._close(writer)
         finally:
+            self.inflight -= reserved
             for filepath in tmp_files:
                 try:
                     os.remove(filepath)
@@ -388,6 +1502,198 @@ class Router:
                 except OSError:
                     pass
 
+    async def _handle_websocket(self, reader, writer, header_str, conn):
+        lines = header_str.split("\r\n")
+        parts = lines[0].split(" ")
+        full_path = parts[1] if len(parts) > 1 else "/"
+        path, query_string = full_path.split("?", 1) if "?" in full_path else (full_path, "")
+        key = None
+        for line in lines[1:]:
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+
+        handler = None
+        path_params = None
+        for route_path, route_handler in self.ws_routes.items():
+            path_params = self._match_path_params(route_path, path)
+            if path_params is not None:
+                handler = route_handler
+                break
+        if handler is None or key is None:
+            response = b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+            conn["status"] = 400
+            conn["bytes_out"] = len(response)
+            try:
+                writer.write(response)
+                await writer.drain()
+            except Exception:
+                pass
+            await self._close(writer)
+            return
+
+        query = {}
+        for pair in query_string.split("&"):
+            if "=" in pair:
+                k, v = pair.split("=", 1)
+                query[k] = v
+        accept = binascii.b2a_base64(hashlib.sha1((key + _WS_GUID).encode()).digest())[:-1].decode()
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        await writer.drain()
+
+        ws = WebSocket(reader)
+        pump = asyncio.create_task(self._pump_websocket(ws, writer))
+        try:
+            await handler(ws, query, path_params)
+        except Exception as e:
+            print("WebSocket handler error:", e)
+        finally:
+            ws.close()
+            # beri kesempatan frame close terkirim
+            for _ in range(20):
+                if not ws._buf:
+                    break
+                await asyncio.sleep(0.01)
+            pump.cancel()
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _pump_websocket(self, ws, writer):
+        try:
+            await ws._pump(writer)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("WebSocket closed:", e)
+            ws.dropped = True
+            ws.close()
+
+    async def _send_json_stream(self, writer, stream, gzip=False):
+        encoder = GzipEncoder(self.gzip_wbits) if gzip else None
+        header = (
+            f"HTTP/1.1 {stream.status} {STATUS_TEXT.get(stream.status, 'OK')}\r\n"
+            "Content-Type: application/json\r\n"
+            "Transfer-Encoding: chunked\r\n"
+        )
+        if encoder:
+            header += "Content-Encoding: gzip\r\nVary: Accept-Encoding\r\n"
+        header += "Connection: close\r\n\r\n"
+        timeout = self.write_timeout_ms / 1000
+        sent = len(header)
+        try:
+            writer.write(header.encode())
+            parts = []
+            size = 0
+            for piece in stream.pieces():
+                parts.append(piece)
+                size += len(piece)
+                if size >= stream.chunk_size:
+                    data = "".join(parts).encode()
+                    if encoder:
+                        data = encoder.compress(data)
+                    await asyncio.wait_for(self._write_chunk(writer, data), timeout)
+                    sent += len(data)
+                    parts = []
+                    size = 0
+            data = "".join(parts).encode()
+            if encoder:
+                data = encoder.compress(data) + encoder.finish()
+                self.stats["gzip"] += 1
+            await asyncio.wait_for(self._write_chunk(writer, data), timeout)
+            sent += len(data)
+            # chunk kosong = akhir body; jika error di atas, client melihat body terpotong
+            writer.write(b"0\r\n\r\n")
+            await asyncio.wait_for(writer.drain(), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeout_write"] += 1
+        except Exception as e:
+            print("JSON stream error:", e)
+        finally:
+            stream.close()
+            await self._close(writer)
+        return sent
+
+    async def _send_gzip(self, writer, header, content):
+        # tiap blok hasil kompresi langsung dikirim sebagai chunk: heap
+        # tidak pernah menampung seluruh hasil kompresi sekaligus
+        encoder = GzipEncoder(self.gzip_wbits)
+        timeout = self.write_timeout_ms / 1000
+        mv = memoryview(content)
+        sent = len(header)
+        packed = 0
+        try:
+            writer.write(header)
+            for i in range(0, len(content), 512):
+                data = encoder.compress(mv[i:i + 512])
+                await asyncio.wait_for(self._write_chunk(writer, data), timeout)
+                packed += len(data)
+            data = encoder.finish()
+            await asyncio.wait_for(self._write_chunk(writer, data), timeout)
+            packed += len(data)
+            writer.write(b"0\r\n\r\n")
+            await asyncio.wait_for(writer.drain(), timeout)
+            self.stats["gzip"] += 1
+            self.stats["gzip_saved_bytes"] += len(content) - packed
+        except asyncio.TimeoutError:
+            self.stats["timeout_write"] += 1
+        except Exception as e:
+            print("Gzip response error:", e)
+        finally:
+            await self._close(writer)
+        return sent + packed
+
+    async def _write_chunk(self, writer, data):
+        if not data:
+            return  # chunk kosong berarti akhir body, jangan dikirim di tengah
+        writer.write(("%x\r\n" % len(data)).encode())
+        writer.write(data)
+        writer.write(b"\r\n")
+        await writer.drain()
+
+    async def _send_stream(self, writer, stream):
+        header = "HTTP/1.1 200 OK\r\n" f"Content-Type: {stream.content_type}\r\n"
+        for key, value in stream.headers.items():
+            header += f"{key}: {value}\r\n"
+        header += "Connection: close\r\n\r\n"
+        producer = None
+        try:
+            writer.write(header.encode())
+            await writer.drain()
+            producer = asyncio.create_task(self._run_producer(stream))
+            await stream._pump(writer)
+        except asyncio.TimeoutError:
+            print("Stream write timeout, dropping client")
+            stream.dropped = True
+        except Exception as e:
+            # client menutup koneksi
+            print("Stream closed:", e)
+        finally:
+            stream.close()
+            if producer is not None:
+                producer.cancel()
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _run_producer(self, stream):
+        try:
+            await stream.producer.run(stream)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("Stream producer error:", e)
+        # producer selesai: pump mengirim sisa buffer lalu berhenti
+        stream.close()
+
     # ============ PRIVATE: Utils ============
     def _guess_content_type(self, filename: str) -> str:
         if filename.endswith(".html"):
@@ -0,0 +1,427 @@
+"""
+Modbus RTU master asinkron untuk port RS485 (UART2, DE/RE di GPIO 14).
+
+Respons dibaca lewat uasyncio StreamReader sehingga coroutine lain tetap
+jalan selama menunggu slave. Pin DE/RE dikembalikan ke mode terima tepat
+saat frame selesai terkirim (dihitung dari baudrate).
+
+Contoh:
+    uart = UART(2, baudrate=9600, tx=15, rx=16)
+    bus = ModbusRTU(uart, de_re=Pin(14, Pin.OUT), baudrate=9600)
+    regs = await bus.read_input_registers(0x01, 0x0001, 2)
+    bus.stats()  # counter per slave, histogram latency, utilisasi bus
+"""
+from array import array
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from ticks import ticks_ms, ticks_us, ticks_add, ticks_diff
+from modbus_frame import ModbusError, FrameCodec, expected_length, check_crc, \
+                         READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, \
+                         WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS
+
+
+# parity gaya konfigurasi -> argumen machine.UART
+PARITY = {"N": None, "E": 0, "O": 1}
+
+
+class ModbusTimeout(ModbusError):
+    pass
+
+
+class ModbusCRCError(ModbusError):
+    pass
+
+
+class ModbusExceptionResponse(ModbusError):
+    def __init__(self, function, code):
+        super().__init__(f"exception 0x{code:02X} on function 0x{function:02X}")
+        self.function = function
+        self.code = code
+
+
+# batas atas bucket histogram latency respons (ms), bucket terakhir = lebih dari itu
+LATENCY_BUCKETS_MS = (2, 5, 10, 20, 50, 100, 200, 500, 1000)
+COUNTERS = ("requests", "responses", "timeouts", "crc_errors", "exceptions", "tx_bytes", "rx_bytes")
+_REQUESTS, _RESPONSES, _TIMEOUTS, _CRC_ERRORS, _EXCEPTIONS, _TX_BYTES, _RX_BYTES = range(7)
+_UTILISATION_WINDOW_MS = 60_000
+
+
+class SlaveStats:
+    def __init__(self):
+        self.counters = array("I", [0] * len(COUNTERS))
+        self.histogram = array("I", [0] * (len(LATENCY_BUCKETS_MS) + 1))
+        self.latency_sum_us = 0
+        self.latency_max_us = 0
+
+    def add_latency(self, latency_us):
+        ms = latency_us // 1000
+        i = 0
+        for bound in LATENCY_BUCKETS_MS:
+            if ms < bound:
+                break
+            i += 1
+        self.histogram[i] += 1
+        self.latency_sum_us += latency_us
+        if latency_us > self.latency_max_us:
+            self.latency_max_us = latency_us
+
+    def to_dict(self):
+        result = {name: self.counters[i] for i, name in enumerate(COUNTERS)}
+        responses = self.counters[_RESPONSES]
+        result["latency_avg_ms"] = round(self.latency_sum_us / responses / 1000, 2) if responses else None
+        result["latency_max_ms"] = round(self.latency_max_us / 1000, 2)
+        result["histogram"] = {
+            "bounds_ms": list(LATENCY_BUCKETS_MS),
+            "counts": list(self.histogram),
+        }
+        return result
+
+
+class ModbusRTU:
+    def __init__(self, uart, de_re=None, baudrate=9600, bits=8, parity=None, stop=1, timeout_ms=1000, min_timeout_ms=20):
+        """
+        Args:
+            uart: machine.UART (atau FakeUART untuk tes di Linux)
+            de_re: Pin DE/RE transceiver RS485 (1 = kirim, 0 = terima), boleh None
+            baudrate, bits, parity, stop: Setting serial (untuk hitung timing)
+            timeout_ms: Batas atas waktu menunggu byte pertama respons slave
+            min_timeout_ms: Batas bawah timeout adaptif per slave
+        """
+        self.uart = uart
+        self.de_re = de_re
+        self.timeout_ms = timeout_ms
+        self.min_timeout_ms = min_timeout_ms
+        self.lock = asyncio.Lock()
+        self.codec = FrameCodec()
+        self._rx = bytearray(256)
+        self._rx_mv = memoryview(self._rx)
+        self._latency = {}  # slave -> [srtt_us, rttvar_us]
+        self._idle_at = ticks_us()
+        self._last_latency_us = 0
+        self._slave_stats = {}
+        self._busy_us = 0        # waktu bus terpakai di window berjalan
+        self._window_start = ticks_ms()
+        self._last_utilisation = None
+
+        if de_re is not None:
+            de_re.value(0)  # default mode terima
+
+        # FakeUART menyediakan stream sendiri, machine.UART dibungkus StreamReader
+        self._reader = uart.stream() if hasattr(uart, "stream") else asyncio.StreamReader(uart)
+        self.set_timing(baudrate, bits, parity, stop)
+        self.line = (baudrate, parity, stop)   # setting UART yang sedang aktif
+        self.default_line = self.line           # setting untuk slave tanpa setting sendiri
+        self.unit_lines = {}                    # slave -> (baudrate, parity, stop)
+        self.switch_us = 5000  # estimasi ongkos ganti setting (EWMA hasil pengukuran)
+        self.switches = 0
+
+    # ============ PUBLIC: Function Code ============
+    # Fungsi read menerima `out` (array/list) opsional untuk diisi ulang
+    # tanpa alokasi; tanpa `out` hasilnya list baru.
+    async def read_coils(self, slave, address, count, out=None):
+        return await self._read_bits(slave, READ_COILS, address, count, out)
+
+    async def read_discrete_inputs(self, slave, address, count, out=None):
+        return await self._read_bits(slave, READ_DISCRETE_INPUTS, address, count, out)
+
+    async def read_holding_registers(self, slave, address, count, out=None):
+        return await self._read_registers(slave, READ_HOLDING_REGISTERS, address, count, out)
+
+    async def read_input_registers(self, slave, address, count, out=None):
+        return await self._read_registers(slave, READ_INPUT_REGISTERS, address, count, out)
+
+    async def write_single_coil(self, slave, address, value):
+        return await self._write(slave, self.codec.write_single, WRITE_SINGLE_COIL, address, value)
+
+    async def write_single_register(self, slave, address, value):
+        return await self._write(slave, self.codec.write_single, WRITE_SINGLE_REGISTER, address, value)
+
+    async def write_multiple_coils(self, slave, address, values):
+        return await self._write(slave, self.codec.write_coils, address, values)
+
+    async def write_multiple_registers(self, slave, address, values):
+        return await self._write(slave, self.codec.write_registers, address, values)
+
+    # ============ PUBLIC: Transport ============
+    def configure(self, baudrate, parity=None, stop=1, bits=8):
+        """Ganti setting serial default bus (parity: None/"N", 0/"E", 1/"O")."""
+        parity = PARITY.get(parity, parity)
+        self.default_line = (baudrate, parity, stop)
+        self._apply_line(self.default_line, bits)
+
+    def set_unit_line(self, slave, line):
+        """
+        Setting serial (baudrate, parity, stop) untuk satu slave; None = ikut
+        default. Setiap transaksi ke slave itu (poller, gateway TCP, WebSocket)
+        otomatis memakai setting ini.
+        """
+        if line is None or line == self.default_line:
+            self.unit_lines.pop(slave, None)
+        else:
+            self.unit_lines[slave] = line
+
+    def set_timing(self, baudrate, bits=8, parity=None, stop=1):
+        """Hitung ulang waktu per karakter setelah setting serial berubah."""
+        self.baudrate = baudrate
+        bits_per_char = 1 + bits + (0 if parity is None else 1) + stop
+        self.char_us = (bits_per_char * 1_000_000 + baudrate - 1) // baudrate
+        # jeda antar frame 3.5 karakter; di atas 19200 baud dipatok 1750 us (spesifikasi Modbus)
+        self.t35_us = 1750 if baudrate > 19200 else (self.char_us * 7 + 1) // 2
+
+    def latency_ms(self, slave):
+        """Latency respons slave hasil pembelajaran (ms), None jika belum ada data."""
+        stat = self._latency.get(slave)
+        return None if stat is None else stat[0] / 1000
+
+    def stats(self, slave=None):
+        """Statistik per slave + utilisasi bus (persen waktu bus terpakai transaksi)."""
+        if slave is not None:
+            stat = self._slave_stats.get(slave)
+            return stat.to_dict() if stat else None
+        self._roll_window()
+        elapsed = ticks_diff(ticks_ms(), self._window_start)
+        return {
+            "baudrate": self.baudrate,
+            "line_switches": self.switches,
+            "switch_cost_ms": self.switch_us / 1000,
+            "utilisation": {
+                "current_pct": round(self._busy_us / 10 / elapsed, 1) if elapsed > 0 else 0,
+                "last_window_pct": self._last_utilisation,
+                "window_s": _UTILISATION_WINDOW_MS // 1000,
+            },
+            "slaves": {str(s): stat.to_dict() for s, stat in self._slave_stats.items()},
+        }
+
+    def reset_stats(self):
+        self._slave_stats = {}
+        self._busy_us = 0
+        self._window_start = ticks_ms()
+        self._last_utilisation = None
+
+    async def exchange(self, frame, expected=None, timeout_ms=None, line=None):
+        """
+        Kirim frame lengkap (sudah ber-CRC, mis. dari FrameCodec) dan kembalikan
+        memoryview frame respons di buffer terima master. View hanya valid
+        sampai transaksi berikutnya; decode langsung tanpa menyalin.
+        Untuk broadcast (slave 0) tidak ada respons, hasilnya None.
+        `timeout_ms` mengganti timeout adaptif untuk transaksi ini saja.
+        `line` memaksa setting serial tertentu (mis. saat scan); tanpa itu
+        dipakai setting slave (`set_unit_line`) atau default bus.
+        """
+        async with self.lock:
+            return await self._exchange(frame, expected, timeout_ms, line)
+
+    async def transact(self, slave, pdu):
+        """
+        Kirim satu PDU ke slave dan kembalikan PDU respons (tanpa address & CRC).
+        Respons exception (function | 0x80) dikembalikan apa adanya.
+        Untuk broadcast (slave 0) tidak ada respons, hasilnya None.
+        """
+        # buffer kirim codec milik master dipakai bersama, jadi encode di dalam lock
+        async with self.lock:
+            resp = await self._exchange(self.codec.pdu(slave, pdu))
+            if resp is None:
+                return None
+            return bytes(resp[1:-2])
+
+    # ============ PRIVATE: Transport ============
+    async def _exchange(self, frame, expected=None, timeout_ms=None, line=None):
+        # dipanggil dengan self.lock sudah dipegang
+        slave = frame[0]
+        if line is None:
+            line = self.unit_lines.get(slave, self.default_line)
+        if line != self.line:
+            self._switch(line)
+        if expected is None:
+            expected = expected_length(frame, 1)
+        stat = self._slave_stats.get(slave)
+        if stat is None:
+            stat = self._slave_stats[slave] = SlaveStats()
+        counters = stat.counters
+        counters[_REQUESTS] += 1
+        self._roll_window()
+        counters[_TX_BYTES] += len(frame)
+
+        await self._wait_idle()
+        self._discard_input()
+        started = ticks_us()
+        await self._send(frame)
+        if slave == 0:
+            self._idle_at = ticks_us()
+            self._busy_us += ticks_diff(self._idle_at, started)
+            return None
+        try:
+            n = await self._receive(slave, expected, timeout_ms)
+        except ModbusTimeout:
+            counters[_TIMEOUTS] += 1
+            raise
+        finally:
+            self._idle_at = ticks_us()
+            self._busy_us += ticks_diff(self._idle_at, started)
+        counters[_RX_BYTES] += n
+
+        if not check_crc(self._rx, n):
+            counters[_CRC_ERRORS] += 1
+            raise ModbusCRCError("CRC mismatch")
+        if self._rx[0] != slave:
+            raise ModbusError(f"unexpected slave {self._rx[0]}")
+        counters[_RESPONSES] += 1
+        stat.add_latency(self._last_latency_us)
+        if self._rx[1] & 0x80:
+            counters[_EXCEPTIONS] += 1
+        return self._rx_mv[:n]
+
+    def _switch(self, line):
+        start = ticks_us()
+        self._apply_line(line)
+        # ongkos = reinit UART + jeda 3.5 karakter sebelum transaksi pertama
+        cost = ticks_diff(ticks_us(), start) + self.t35_us
+        self.switch_us += (cost - self.switch_us) // 4
+        self.switches += 1
+
+    def _apply_line(self, line, bits=8):
+        baudrate, parity, stop = line
+        self.uart.init(baudrate=baudrate, bits=bits, parity=parity, stop=stop)
+        self.set_timing(baudrate, bits, parity, stop)
+        self.line = line
+        # byte sisa setting lama dianggap sampah: tunggu jeda 3.5 karakter baru
+        self._idle_at = ticks_us()
+
+    def _roll_window(self):
+        elapsed = ticks_diff(ticks_ms(), self._window_start)
+        if elapsed >= _UTILISATION_WINDOW_MS:
+            self._last_utilisation = round(self._busy_us / 10 / elapsed, 1)
+            self._busy_us = 0
+            self._window_start = ticks_ms()
+
+    def _discard_input(self):
+        while self.uart.any():
+            self.uart.readinto(self._rx)
+
+    async def _wait_idle(self):
+        # bus harus diam minimal 3.5 karakter sebelum request berikutnya
+        remaining = ticks_diff(ticks_add(self._idle_at, self.t35_us), ticks_us())
+        if remaining > 0:
+            await asyncio.sleep(remaining / 1_000_000)
+
+    async def _send(self, frame):
+        de_re = self.de_re
+        if de_re is not None:
+            de_re.value(1)
+        start = ticks_us()
+        self.uart.write(frame)
+        done = ticks_add(start, len(frame) * self.char_us)
+
+        # sebagian besar waktu kirim ditunggu tanpa memblok loop,
+        # sisa < 1.5 ms di-spin supaya DE/RE turun tepat di akhir frame
+        remaining = ticks_diff(done, ticks_us())
+        if remaining > 2000:
+            await asyncio.sleep((remaining - 1500) / 1_000_000)
+        while ticks_diff(done, ticks_us()) > 0:
+            pass
+        txdone = getattr(self.uart, "txdone", None)
+        if txdone is not None:
+            while not txdone():
+                pass
+
+        if de_re is not None:
+            de_re.value(0)
+
+    def _first_byte_timeout_us(self, slave):
+        # timeout adaptif ala RTO TCP: srtt + 4 * rttvar, dibatasi [min, max]
+        stat = self._latency.get(slave)
+        if stat is None:
+            return self.timeout_ms * 1000
+        timeout = stat[0] + 4 * stat[1] + self.t35_us + 2 * self.char_us
+        return max(self.min_timeout_ms * 1000, min(timeout, self.timeout_ms * 1000))
+
+    def _learn_latency(self, slave, latency_us):
+        stat = self._latency.get(slave)
+        if stat is None:
+            self._latency[slave] = [latency_us, latency_us // 2]
+        else:
+            err = latency_us - stat[0]
+            stat[0] += err // 8
+            stat[1] += (abs(err) - stat[1]) // 4
+
+    def _penalize(self, slave):
+        # setelah timeout, longgarkan lagi supaya slave lambat tidak terus gagal
+        stat = self._latency.get(slave)
+        if stat is not None:
+            stat[0] = min(stat[0] * 2, self.timeout_ms * 1000)
+
+    async def _read_some(self, pos, n, timeout_us):
+        # baca langsung ke buffer terima (tanpa bytes sementara)
+        try:
+            got = await asyncio.wait_for(self._reader.readinto(self._rx_mv[pos:pos + n]), timeout_us / 1_000_000)
+        except asyncio.TimeoutError:
+            return pos, False
+        return pos + (got or 0), True
+
+    async def _receive(self, slave, expected, timeout_ms=None):
+        """
+        Baca satu frame respons. Selesai begitu `expected` byte diterima;
+        jika panjang tidak diketahui (atau frame terpotong), akhir frame
+        ditentukan dari jeda diam 3.5 karakter.
+        """
+        size = len(self._rx)
+        sent_at = ticks_us()
+        want = expected if expected else size
+        first_timeout = self._first_byte_timeout_us(slave) if timeout_ms is None else timeout_ms * 1000
+        pos, ok = await self._read_some(0, want, first_timeout)
+        if not ok:
+            if timeout_ms is None:
+                self._penalize(slave)
+            raise ModbusTimeout(f"no response from slave {slave}")
+        self._last_latency_us = max(0, ticks_diff(ticks_us(), sent_at) - pos * self.char_us)
+        self._learn_latency(slave, self._last_latency_us)
+
+        buf = self._rx
+        while pos < size:
+            if pos >= 2 and buf[1] & 0x80:
+                expected = 5  # respons exception: addr, fc, code, crc
+            if expected and pos >= expected:
+                break
+            # sisa byte datang sesuai waktu kabel, lewat dari itu + t3.5 = akhir frame
+            remaining = (expected - pos) if expected else 1
+            pos, ok = await self._read_some(pos, (expected or size) - pos,
+                                            remaining * self.char_us + self.t35_us + 1000)
+            if not ok:
+                break
+        return pos
+
+    async def _read_registers(self, slave, function, address, count, out):
+        resp = await self.exchange(self.codec.read_request(slave, function, address, count))
+        self._check(function, resp)
+        if out is None:
+            out = [0] * count
+        self.codec.registers_into(resp, out, count)
+        return out
+
+    async def _read_bits(self, slave, function, address, count, out):
+        resp = await self.exchange(self.codec.read_request(slave, function, address, count))
+        self._check(function, resp)
+        if out is None:
+            out = [0] * count
+        self.codec.bits_into(resp, out, count)
+        return out
+
+    async def _write(self, slave, encode, *args):
+        async with self.lock:
+            frame = encode(slave, *args)
+            function = frame[1]
+            resp = await self._exchange(frame)
+            if resp is None:
+                return True
+            self._check(function, resp)
+            return True
+
+    def _check(self, function, resp):
+        if resp[1] == function | 0x80:
+            raise ModbusExceptionResponse(function, resp[2])
+        if resp[1] != function:
+            raise ModbusError(f"unexpected function 0x{resp[1]:02X}")
@@ -0,0 +1,168 @@
+"""
+Codec frame Modbus RTU tanpa alokasi di jalur panas.
+
+Request di-encode ke buffer milik device yang dipakai ulang; request tetap
+(polling rutin) di-encode sekali lalu di-cache seperti `distance_frame` di
+driver radar. Respons di-decode langsung dari memoryview buffer terima
+master, register di-unpack sekaligus dengan struct.unpack_from ke array
+yang sudah dialokasikan.
+
+Contoh:
+    codec = FrameCodec()
+    values = array("H", [0] * 6)
+    frame = codec.read_request(0x01, READ_HOLDING_REGISTERS, 0x0000, 6)
+    resp = await bus.exchange(frame)
+    codec.registers_into(resp, values)
+"""
+import struct
+
+from checksum import crc16_modbus
+
+# Function code
+READ_COILS = 0x01
+READ_DISCRETE_INPUTS = 0x02
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_COIL = 0x05
+WRITE_SINGLE_REGISTER = 0x06
+WRITE_MULTIPLE_COILS = 0x0F
+WRITE_MULTIPLE_REGISTERS = 0x10
+
+class ModbusError(Exception):
+    pass
+
+
+# format struct per jumlah register, dibuat sekali per ukuran blok
+_formats = {}
+
+
+def expected_length(frame, offset=0):
+    """
+    Panjang frame respons (termasuk address & CRC) dari request yang PDU-nya
+    mulai di frame[offset], None jika tidak diketahui.
+    """
+    function = frame[offset]
+    if function in (READ_COILS, READ_DISCRETE_INPUTS):
+        count = (frame[offset + 3] << 8) | frame[offset + 4]
+        return 5 + (count + 7) // 8
+    if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+        count = (frame[offset + 3] << 8) | frame[offset + 4]
+        return 5 + 2 * count
+    if function in (WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS):
+        return 8
+    return None
+
+
+def check_crc(frame, n):
+    """True jika CRC di 2 byte terakhir frame[:n] cocok."""
+    if n < 4:
+        return False
+    return crc16_modbus(frame, 0, n - 2) == (frame[n - 2] | (frame[n - 1] << 8))
+
+
+def check_byte_count(resp, nbytes):
+    """
+    Pastikan respons read (addr, fc, byte count, data..., CRC) membawa tepat
+    `nbytes` byte data. Slave yang menjawab terlalu pendek (CRC tetap valid)
+    jadi ModbusError, bukan struct.error saat decode.
+    """
+    if len(resp) < 5 or resp[2] != nbytes or len(resp) < 5 + nbytes:
+        raise ModbusError(f"byte count {resp[2] if len(resp) > 2 else '?'}, expected {nbytes}")
+
+
+def register_format(count):
+    fmt = _formats.get(count)
+    if fmt is None:
+        fmt = _formats[count] = ">%dH" % count
+    return fmt
+
+
+class FrameCodec:
+    def __init__(self, size=256):
+        """
+        Args:
+            size: Ukuran buffer kirim (maks ADU Modbus RTU = 256 byte)
+        """
+        self.tx = bytearray(size)
+        self._tx_mv = memoryview(self.tx)
+        self._cache = {}
+
+    # ============ PUBLIC: Encode ============
+    def read_request(self, slave, function, address, count):
+        """Frame read (FC 01-04) lengkap dengan CRC, di-cache per kombinasi."""
+        key = (slave << 40) | (function << 32) | (address << 16) | count
+        frame = self._cache.get(key)
+        if frame is None:
+            frame = bytearray(8)
+            struct.pack_into(">BBHH", frame, 0, slave, function, address, count)
+            self._seal(frame, 6)
+            frame = self._cache[key] = bytes(frame)
+        return frame
+
+    def write_single(self, slave, function, address, value):
+        """Frame FC 05/06 di buffer kirim (memoryview, valid sampai encode berikutnya)."""
+        if function == WRITE_SINGLE_COIL:
+            value = 0xFF00 if value else 0x0000
+        struct.pack_into(">BBHH", self.tx, 0, slave, function, address, value & 0xFFFF)
+        return self._seal(self.tx, 6)
+
+    def write_registers(self, slave, address, values):
+        """Frame FC 16 di buffer kirim."""
+        count = len(values)
+        tx = self.tx
+        struct.pack_into(">BBHHB", tx, 0, slave, WRITE_MULTIPLE_REGISTERS, address, count, 2 * count)
+        pos = 7
+        for value in values:
+            tx[pos] = (value >> 8) & 0xFF
+            tx[pos + 1] = value & 0xFF
+            pos += 2
+        return self._seal(tx, pos)
+
+    def write_coils(self, slave, address, values):
+        """Frame FC 15 di buffer kirim."""
+        count = len(values)
+        nbytes = (count + 7) // 8
+        tx = self.tx
+        struct.pack_into(">BBHHB", tx, 0, slave, WRITE_MULTIPLE_COILS, address, count, nbytes)
+        for i in range(nbytes):
+            tx[7 + i] = 0
+        for i in range(count):
+            if values[i]:
+                tx[7 + (i >> 3)] |= 1 << (i & 7)
+        return self._seal(tx, 7 + nbytes)
+
+    def pdu(self, slave, pdu):
+        """Bungkus PDU mentah jadi frame di buffer kirim."""
+        n = len(pdu)
+        self.tx[0] = slave
+        self.tx[1:1 + n] = pdu
+        return self._seal(self.tx, 1 + n)
+
+    # ============ PUBLIC: Decode ============
+    def registers_into(self, resp, out, count=None, offset=0):
+        """
+        Unpack register respons FC 03/04 ke `out` (array("H") / list) mulai `offset`.
+        Mengembalikan jumlah register.
+        """
+        n = resp[2] // 2 if count is None else count
+        check_byte_count(resp, 2 * n)
+        values = struct.unpack_from(register_format(n), resp, 3)
+        for i in range(n):
+            out[offset + i] = values[i]
+        return n
+
+    def bits_into(self, resp, out, count, offset=0):
+        """Unpack bit respons FC 01/02 ke `out` (0/1) mulai `offset`."""
+        check_byte_count(resp, (count + 7) // 8)
+        for i in range(count):
+            out[offset + i] = (resp[3 + (i >> 3)] >> (i & 7)) & 1
+        return count
+
+    # ============ PRIVATE ============
+    def _seal(self, buf, n):
+        crc = crc16_modbus(buf, 0, n)
+        buf[n] = crc & 0xFF
+        buf[n + 1] = crc >> 8
+        if buf is self.tx:
+            return self._tx_mv[:n + 2]
+        return buf
@@ -0,0 +1,289 @@
+"""
+Scheduler polling Modbus multi-device untuk satu bus RS485 half-duplex.
+
+Daftar device & register (`module:rs485`) di-compile jadi poll plan:
+register yang berdekatan di slave & function code yang sama digabung jadi
+satu block read (dibatasi `max_gap` dan `max_registers`). Block dijalankan
+earliest-deadline-first sesuai interval tercepat dari point di dalamnya.
+
+Device boleh punya setting serial sendiri (`baudrate`, `parity`, `stop`).
+Ganti setting UART ada ongkosnya (re-init + jeda 3.5 karakter, diukur saat
+jalan), jadi block dikelompokkan per setting serial: sebelum pindah setting,
+block di setting yang sedang aktif yang jatuh tempo dalam horizon switch
+dijalankan lebih awal, sehingga reinit UART per siklus seminimal mungkin.
+
+Format device (point manual):
+    {
+        "name": "xy1",
+        "slave": 1,
+        "points": [
+            {"name": "temperature", "function": 4, "address": 1, "interval": 5, "scale": 0.1, "type": "s16"},
+            {"name": "humidity", "function": 4, "address": 2, "interval": 5, "scale": 0.1}
+        ]
+    }
+
+Atau memakai profil sensor (lihat modbus_profile), satu block per device:
+    {"name": "dust1", "slave": 2, "profile": "rk300_02b", "interval": 10, "baudrate": 4800}
+"""
+from array import array
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from ticks import ticks_ms, ticks_add, ticks_diff
+from modbus import ModbusError, PARITY
+from modbus_profile import load_profile
+from modbus_frame import FrameCodec, check_byte_count, READ_COILS, READ_DISCRETE_INPUTS, READ_INPUT_REGISTERS
+
+_BIT_FUNCTIONS = (READ_COILS, READ_DISCRETE_INPUTS)
+_MAX_BITS = 2000  # batas spesifikasi FC 01/02
+
+
+class PollBlock:
+    def __init__(self, slave, function, address, count, interval_ms, points, decoder=None, line=None):
+        self.slave = slave
+        self.line = line  # (baudrate, parity, stop), None = setting bus saat ini
+        self.function = function
+        self.address = address
+        self.count = count
+        self.interval_ms = interval_ms
+        self.points = points  # [(device, name, offset, scale, signed)], atau nama device jika pakai decoder
+        self.decoder = decoder
+        self.due = ticks_ms()
+        self.frame = None
+        if decoder is not None:
+            self.values = {}
+        elif function in _BIT_FUNCTIONS:
+            self.values = bytearray(count)
+        else:
+            self.values = array("H", [0] * count)
+        self.errors = 0
+
+    def __repr__(self):
+        line = f" @{self.line[0]}" if self.line else ""
+        return f"<PollBlock slave={self.slave} fc={self.function} {self.address}+{self.count} every {self.interval_ms}ms{line}>"
+
+
+def device_line(device, default):
+    """Setting serial device (baudrate, parity, stop), kosong = ikut `default`."""
+    return (
+        device.get("baudrate", default[0]),
+        PARITY.get(device["parity"], device["parity"]) if "parity" in device else default[1],
+        device.get("stop", default[2]),
+    )
+
+
+def build_plan(devices, max_gap=4, max_registers=64, line=(9600, None, 1)):
+    """
+    Gabungkan point dari semua device jadi daftar PollBlock.
+
+    Args:
+        devices: Isi `module:rs485`
+        max_gap: Jumlah register kosong maksimal di antara dua point yang digabung
+        max_registers: Panjang maksimal satu block read
+        line: Setting serial default (baudrate, parity, stop)
+    """
+    groups = {}
+    blocks = []
+    for device in devices:
+        slave = device.get("slave", 1)
+        device_setting = device_line(device, line)
+        if device.get("profile"):
+            block = _profile_block(device, slave, device_setting)
+            if block is not None:
+                blocks.append(block)
+            continue
+        default_interval = device.get("interval", 5)
+        for point in device.get("points", []):
+            function = point.get("function", READ_INPUT_REGISTERS)
+            groups.setdefault((device_setting, slave, function), []).append((
+                point.get("address", 0),
+                point.get("count", 1),
+                int(point.get("interval", default_interval) * 1000),
+                (device.get("name", f"slave{slave}"), point["name"],
+                 point.get("scale", 1), point.get("type", "u16") == "s16"),
+            ))
+
+    for (device_setting, slave, function), points in groups.items():
+        points.sort(key=lambda p: p[0])
+        limit = _MAX_BITS if function in _BIT_FUNCTIONS else max_registers
+        current = None
+        for address, count, interval_ms, info in points:
+            if current is not None:
+                start, end, block_interval, members = current
+                if address - end <= max_gap and max(end, address + count) - start <= limit:
+                    current = (start, max(end, address + count), min(block_interval, interval_ms), members)
+                    members.append((address, info))
+                    continue
+                blocks.append(_make_block(slave, function, current, device_setting))
+            current = (address, address + count, interval_ms, [(address, info)])
+        if current is not None:
+            blocks.append(_make_block(slave, function, current, device_setting))
+    return blocks
+
+
+def _profile_block(device, slave, line):
+    name = device.get("name", f"slave{slave}")
+    try:
+        decoder = load_profile(device["profile"])
+    except Exception as e:
+        print(f"RS485 device {name}: profile {device['profile']} error: {e}")
+        return None
+    interval_ms = int(device.get("interval", decoder.interval) * 1000)
+    return PollBlock(slave, decoder.function, decoder.address, decoder.count, interval_ms, name, decoder, line)
+
+
+def _make_block(slave, function, group, line):
+    start, end, interval_ms, members = group
+    points = [(device, name, address - start, scale, signed)
+              for address, (device, name, scale, signed) in members]
+    return PollBlock(slave, function, start, end - start, interval_ms, points, line=line)
+
+
+class PollScheduler:
+    def __init__(self, bus, devices, on_values=None, max_gap=4, max_registers=64, max_lateness_ms=1000):
+        """
+        Args:
+            bus: ModbusRTU bersama
+            devices: Isi `module:rs485`
+            on_values: Callback `on_values(device, {name: value})` setiap block terbaca
+            max_lateness_ms: Batas telat block di setting serial lain sebelum
+                             pengelompokan dikalahkan deadline
+        """
+        self.bus = bus
+        self.line = bus.default_line  # setting serial default bus
+        self.max_lateness_ms = max_lateness_ms
+        self.on_values = on_values
+        self.max_gap = max_gap
+        self.max_registers = max_registers
+        self.codec = FrameCodec()
+        self.transactions = 0
+        self.paused = False
+        self.blocks = []
+        self.reload(devices)
+
+    # ============ PUBLIC ============
+    def reload(self, devices):
+        """Bangun ulang poll plan (mis. setelah konfigurasi berubah)."""
+        self.blocks = build_plan(devices, self.max_gap, self.max_registers, self.line)
+        self.bus.unit_lines.clear()
+        for block in self.blocks:
+            block.frame = self.codec.read_request(block.slave, block.function, block.address, block.count)
+            # setting per slave disimpan di bus, jadi gateway/WebSocket ikut memakainya
+            self.bus.set_unit_line(block.slave, block.line)
+        print(f"RS485 poll plan: {len(self.blocks)} block(s)")
+        for block in self.blocks:
+            print(" ", block)
+
+    def pause(self):
+        """Hentikan polling sementara (mis. selama scan bus)."""
+        self.paused = True
+
+    def resume(self):
+        now = ticks_ms()
+        for block in self.blocks:
+            if ticks_diff(now, block.due) > 0:
+                block.due = now
+        self.paused = False
+
+    def next_block(self):
+        """Block berikutnya yang akan dijalankan (lihat `_select`)."""
+        return self._select(ticks_ms())[0]
+
+    async def run(self):
+        while True:
+            block, wait = self._select(ticks_ms())
+            if block is None or self.paused:
+                await asyncio.sleep(1)
+                continue
+            if wait > 0:
+                await asyncio.sleep(min(wait, 1000) / 1000)
+                continue
+            try:
+                await self.poll(block)
+            except Exception as e:
+                # error decode / callback tidak boleh mematikan worker
+                block.errors += 1
+                if block.errors == 1:
+                    print(f"RS485 slave {block.slave} fc {block.function} @{block.address} error: {e}")
+            self._reschedule(block)
+
+    async def poll(self, block):
+        self.transactions += 1
+        try:
+            resp = await self.bus.exchange(block.frame, line=block.line)
+            if resp[1] != block.function:
+                raise ModbusError(f"exception 0x{resp[2]:02X}")
+            if block.decoder is not None:
+                check_byte_count(resp, 2 * block.decoder.count)
+                block.decoder.decode(resp, block.values)
+            elif block.function in _BIT_FUNCTIONS:
+                self.codec.bits_into(resp, block.values, block.count)
+            else:
+                self.codec.registers_into(resp, block.values, block.count)
+        except ModbusError as e:
+            block.errors += 1
+            if block.errors == 1:
+                print(f"RS485 slave {block.slave} fc {block.function} @{block.address}: {e}")
+            return False
+        self._publish(block)
+        block.errors = 0
+        return True
+
+    # ============ PRIVATE ============
+    def _select(self, now):
+        """
+        (block, tunggu_ms). EDF biasa, kecuali block terdekat butuh ganti
+        setting serial: block di setting aktif yang jatuh tempo dalam
+        max(4x ongkos switch, interval/4 block itu) dijalankan dulu lebih
+        awal, selama block setting lain belum telat melebihi
+        min(interval/2, max_lateness_ms).
+        """
+        best = None
+        for block in self.blocks:
+            if best is None or ticks_diff(block.due, best.due) < 0:
+                best = block
+        if best is None:
+            return None, 0
+        wait = ticks_diff(best.due, now)
+        current = self.bus.line
+        if best.line is None or best.line == current:
+            return best, wait
+
+        horizon = max(4 * self.bus.switch_us // 1000, 10)
+        slack = min(best.interval_ms // 2, self.max_lateness_ms)
+        if wait > horizon or -wait >= slack:
+            return best, wait
+        early = None
+        for block in self.blocks:
+            if block.line == current and ticks_diff(block.due, now) <= max(horizon, block.interval_ms // 4):
+                if early is None or ticks_diff(block.due, early.due) < 0:
+                    early = block
+        if early is not None:
+            return early, 0
+        return best, wait
+
+    def _reschedule(self, block):
+        block.due = ticks_add(block.due, block.interval_ms)
+        now = ticks_ms()
+        if ticks_diff(now, block.due) > 0:
+            # tertinggal lebih dari satu interval: jangan kejar ketinggalan
+            block.due = ticks_add(now, block.interval_ms)
+
+    def _publish(self, block):
+        if self.on_values is None:
+            return
+        if block.decoder is not None:
+            self.on_values(block.points, block.values)
+            return
+        values = block.values
+        result = {}
+        for device, name, offset, scale, signed in block.points:
+            raw = values[offset]
+            if signed and raw & 0x8000:
+                raw -= 0x10000
+            result.setdefault(device, {})[name] = raw * scale if scale != 1 else raw
+        for device, named in result.items():
+            self.on_values(device, named)
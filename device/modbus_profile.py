@@ -0,0 +1,131 @@
+"""
+Profil sensor Modbus deklaratif (JSON di flash) yang di-compile jadi decoder.
+
+Satu profil menjelaskan register map satu model sensor: function code,
+alamat, tipe data (u16/s16/u32/s32/float32), urutan word untuk tipe 32-bit
+dan skala. Saat load, profil di-compile jadi satu format struct untuk
+seluruh block read (register yang tidak dipakai jadi padding "x"), sehingga
+decode = satu struct.unpack_from + skala, tanpa aritmatika per field.
+
+Format profil (profiles/<nama>.json):
+    {
+        "model": "XY-MD02",
+        "function": 4,
+        "interval": 5,
+        "word_order": "big",
+        "registers": [
+            {"name": "temperature", "address": 1, "type": "s16", "scale": 0.1, "unit": "C"},
+            {"name": "energy", "address": 8, "type": "u32", "word_order": "little"}
+        ]
+    }
+
+Device di `module:rs485` cukup menyebut profilnya:
+    {"name": "xy1", "slave": 1, "profile": "xy_md02"}
+"""
+import json
+import struct
+
+PROFILE_FOLDER = "profiles"
+
+# tipe -> (kode struct, jumlah register)
+TYPES = {
+    "u16": ("H", 1),
+    "s16": ("h", 1),
+    "u32": ("I", 2),
+    "s32": ("i", 2),
+    "float32": ("f", 2),
+}
+
+_profiles = {}
+
+
+class ProfileError(Exception):
+    pass
+
+
+class Decoder:
+    def __init__(self, profile):
+        """
+        Compile profil (dict) jadi decoder block read.
+
+        Raises:
+            ProfileError: Tipe tidak dikenal atau register bertumpuk
+        """
+        self.model = profile.get("model", "?")
+        self.function = profile.get("function", 4)
+        self.interval = profile.get("interval", 5)
+        default_order = profile.get("word_order", "big")
+
+        registers = sorted(profile.get("registers", []), key=lambda r: r["address"])
+        if not registers:
+            raise ProfileError(f"{self.model}: no registers")
+
+        self.address = registers[0]["address"]
+        fmt = ">"
+        pos = self.address
+        names = []
+        scales = []
+        swaps = []
+        for reg in registers:
+            kind = reg.get("type", "u16")
+            if kind not in TYPES:
+                raise ProfileError(f"{self.model}.{reg['name']}: unknown type {kind}")
+            code, size = TYPES[kind]
+            if reg["address"] < pos:
+                raise ProfileError(f"{self.model}.{reg['name']}: overlaps previous register")
+            if reg["address"] > pos:
+                fmt += "%dx" % (2 * (reg["address"] - pos))
+            fmt += code
+            if size == 2 and reg.get("word_order", default_order) == "little":
+                # offset byte dalam respons (data mulai di byte ke-3)
+                swaps.append(3 + 2 * (reg["address"] - self.address))
+            names.append(reg["name"])
+            scales.append(reg.get("scale", 1))
+            pos = reg["address"] + size
+
+        self.count = pos - self.address
+        self.format = fmt
+        self.names = tuple(names)
+        self.scales = tuple(scales)
+        self.swaps = tuple(swaps)
+        self.units = {r["name"]: r["unit"] for r in registers if "unit" in r}
+        self._scaled = any(s != 1 for s in scales)
+
+    def __repr__(self):
+        return f"<Decoder {self.model} fc={self.function} {self.address}+{self.count} '{self.format}'>"
+
+    # ============ PUBLIC ============
+    def decode(self, resp, out=None):
+        """
+        Decode frame respons FC 03/04 (bytearray/memoryview yang bisa ditulis)
+        jadi {nama: nilai}. Word untuk tipe 32-bit little word order ditukar
+        langsung di buffer respons.
+        """
+        for i in self.swaps:
+            hi0, hi1 = resp[i], resp[i + 1]
+            resp[i], resp[i + 1] = resp[i + 2], resp[i + 3]
+            resp[i + 2], resp[i + 3] = hi0, hi1
+        values = struct.unpack_from(self.format, resp, 3)
+        if out is None:
+            out = {}
+        if self._scaled:
+            for name, value, scale in zip(self.names, values, self.scales):
+                out[name] = value * scale if scale != 1 else value
+        else:
+            for name, value in zip(self.names, values):
+                out[name] = value
+        return out
+
+
+# ============ PUBLIC ============
+def load_profile(name, folder=PROFILE_FOLDER):
+    """Decoder untuk profil `name` (di-cache setelah load pertama)."""
+    decoder = _profiles.get(name)
+    if decoder is None:
+        with open(f"{folder}/{name}.json", "r") as f:
+            decoder = _profiles[name] = Decoder(json.load(f))
+    return decoder
+
+
+def clear_cache():
+    _profiles.clear()
@@ -0,0 +1,214 @@
+"""
+Discovery bus RS485 sebagai job latar belakang.
+
+Setiap address di-probe dengan FC 03 (1 register) memakai timeout pendek
+yang dihitung dari panjang frame dan baudrate, untuk beberapa kombinasi
+baudrate/parity umum. Respons valid maupun respons exception dihitung
+sebagai device ditemukan. Hasil disimpan di config `rs485:scan`, sehingga
+scan "quick" cukup memverifikasi device yang sudah dikenal, mencari ulang
+address yang berubah, lalu menyapu address lain dengan timeout pendek di
+setting serial yang sudah dipakai bus. Device yang tidak menjawab di
+rentang yang di-scan dibuang dari cache.
+
+Contoh:
+    scanner = BusScanner(rs485, db, poller=rs485_poller)
+    scanner.start(mode="full")
+    scanner.status()  # {"running": True, "progress": {...}, "found": [...]}
+"""
+import time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from modbus import PARITY, ModbusError, ModbusTimeout, ModbusCRCError
+from modbus_frame import FrameCodec, READ_HOLDING_REGISTERS
+
+# kombinasi umum, urut dari yang paling sering dipakai sensor di lapangan
+DEFAULT_COMBOS = [
+    (9600, "N"), (4800, "N"), (19200, "N"), (2400, "N"), (38400, "N"), (115200, "N"),
+    (9600, "E"), (19200, "E"),
+]
+
+_REQUEST_LEN = 8
+_RESPONSE_LEN = 7
+
+
+class BusScanner:
+    def __init__(self, bus, db, poller=None, turnaround_ms=50, quick_turnaround_ms=10):
+        """
+        Args:
+            bus: ModbusRTU bersama
+            db: DataJSON, hasil disimpan di key `rs485:scan`
+            poller: PollScheduler yang di-pause selama scan
+            turnaround_ms: Waktu tanggap slave yang ditoleransi
+            quick_turnaround_ms: Toleransi saat menyapu address baru di scan quick
+        """
+        self.bus = bus
+        self.db = db
+        self.poller = poller
+        self.turnaround_ms = turnaround_ms
+        self.quick_turnaround_ms = quick_turnaround_ms
+        self.codec = FrameCodec()
+        self.found = []
+        self.progress = {}
+        self._task = None
+        self._started = 0
+        self._finished = 0
+        self._error = None
+        self._line = None  # setting serial yang sedang di-probe
+
+    # ============ PUBLIC ============
+    def running(self):
+        return self._task is not None and self._finished == 0
+
+    def start(self, mode="quick", start=1, end=247, combos=None):
+        """Mulai scan di background. False jika masih ada scan berjalan."""
+        if self.running():
+            return False
+        combos = [(int(b), p) for b, p in combos] if combos else DEFAULT_COMBOS
+        self.found = []
+        self.progress = {"mode": mode, "probed": 0, "total": 0, "baudrate": None, "parity": None, "address": None}
+        self._started = time.time()
+        self._finished = 0
+        self._error = None
+        self._task = asyncio.create_task(self._run(mode, start, end, combos))
+        return True
+
+    def cancel(self):
+        if self.running():
+            self._task.cancel()
+            return True
+        return False
+
+    def status(self):
+        cached = self.db.get("rs485:scan", {})
+        return {
+            "running": self.running(),
+            "started_at": self._started,
+            "finished_at": self._finished,
+            "error": self._error,
+            "progress": self.progress,
+            "found": self.found,
+            "cached": cached.get("devices", []),
+        }
+
+    # ============ PRIVATE ============
+    async def _run(self, mode, start, end, combos):
+        if self.poller:
+            self.poller.pause()
+        try:
+            if mode == "full" or not self.db.get("rs485:scan", {}).get("devices"):
+                await self._full(start, end, combos)
+            else:
+                await self._quick(start, end, combos)
+            self._save(start, end)
+        except asyncio.CancelledError:
+            self._error = "cancelled"
+        except Exception as e:
+            self._error = str(e)
+            print("RS485 scan error:", e)
+        finally:
+            if self.poller:
+                self.poller.resume()
+            self._finished = time.time()
+            print(f"RS485 scan done: {len(self.found)} device(s)")
+
+    async def _full(self, start, end, combos):
+        self.progress["total"] = (end - start + 1) * len(combos)
+        seen = set()
+        for baudrate, parity in combos:
+            self._set_line(baudrate, parity)
+            for address in range(start, end + 1):
+                if address in seen:
+                    self.progress["probed"] += 1
+                    continue
+                if await self._probe(address, baudrate, parity):
+                    seen.add(address)
+
+    async def _quick(self, start, end, combos):
+        # verifikasi device yang sudah dikenal di setting terakhirnya
+        known = [d for d in self.db.get("rs485:scan", {}).get("devices", [])
+                 if start <= d.get("address", 0) <= end]
+        self.progress["total"] = len(known)
+        missing = []
+        for device in sorted(known, key=lambda d: (d.get("baudrate"), d.get("parity"))):
+            self._set_line(device["baudrate"], device["parity"])
+            if not await self._probe(device["address"], device["baudrate"], device["parity"]):
+                missing.append(device)
+
+        # device yang hilang: mungkin baudrate/parity-nya diganti
+        if missing:
+            self.progress["total"] += len(missing) * len(combos)
+            for baudrate, parity in combos:
+                if not missing:
+                    break
+                self._set_line(baudrate, parity)
+                for device in list(missing):
+                    if await self._probe(device["address"], baudrate, parity):
+                        missing.remove(device)
+
+        # address lain: sapuan murah di setting yang sudah dipakai bus,
+        # setting lain hanya dicari oleh scan full
+        lines = []
+        for device in known + self.found:
+            line = (device["baudrate"], device["parity"])
+            if line not in lines:
+                lines.append(line)
+        if not lines:
+            lines.append(combos[0])
+        seen = {d["address"] for d in known} | {d["address"] for d in self.found}
+        fresh = [a for a in range(start, end + 1) if a not in seen]
+        self.progress["total"] += len(fresh) * len(lines)
+        for baudrate, parity in lines:
+            self._set_line(baudrate, parity)
+            for address in list(fresh):
+                if await self._probe(address, baudrate, parity, self.quick_turnaround_ms):
+                    fresh.remove(address)
+
+    def _set_line(self, baudrate, parity):
+        # setting dipakai per transaksi lewat exchange(line=...), default bus tidak diubah
+        self._line = (baudrate, PARITY.get(parity, parity), 1)
+        self.progress["baudrate"] = baudrate
+        self.progress["parity"] = parity
+
+    async def _probe(self, address, baudrate, parity, turnaround_ms=None):
+        self.progress["address"] = address
+        self.progress["probed"] += 1
+        # waktu kabel request + respons + jeda antar frame + toleransi slave
+        bits_per_char = 10 if self._line[1] is None else 11
+        char_us = bits_per_char * 1_000_000 // baudrate
+        t35_us = 1750 if baudrate > 19200 else char_us * 7 // 2
+        wire_ms = ((_REQUEST_LEN + _RESPONSE_LEN) * char_us + t35_us) // 1000 + 1
+        if turnaround_ms is None:
+            turnaround_ms = self.turnaround_ms
+        frame = self.codec.read_request(address, READ_HOLDING_REGISTERS, 0, 1)
+        try:
+            resp = await self.bus.exchange(frame, _RESPONSE_LEN, timeout_ms=wire_ms + turnaround_ms,
+                                           line=self._line)
+        except ModbusTimeout:
+            return False
+        except ModbusCRCError:
+            # ada yang menjawab tapi rusak: kemungkinan setting serial salah
+            return False
+        except ModbusError:
+            return False
+        device = {
+            "address": address,
+            "baudrate": baudrate,
+            "parity": parity,
+            "exception": resp[2] if resp[1] & 0x80 else None,
+            "seen_at": time.time(),
+        }
+        self.found.append(device)
+        print(f"RS485 found 0x{address:02X} @ {baudrate} {parity}")
+        return True
+
+    def _save(self, start, end):
+        # semua address di rentang sudah di-probe: yang tidak menjawab dibuang
+        cached = self.db.get("rs485:scan", {}).get("devices", [])
+        merged = [d for d in cached if not start <= d["address"] <= end]
+        merged.extend({k: d[k] for k in ("address", "baudrate", "parity")} for d in self.found)
+        merged.sort(key=lambda d: d["address"])
+        self.db.set("rs485:scan", {"devices": merged, "updated_at": time.time()})
@@ -0,0 +1,456 @@
+"""
+Simulator slave Modbus RTU untuk tes & benchmark di Linux (CPython).
+
+Meniru sensor yang dipakai box ini (XY-MD02, RK300-02B, AnSens-0105) dan
+register bank generik. Simulator dipasang sebagai handler FakeUART, atau
+dijalankan di pasangan pty supaya tool lain (mbpoll, pymodbus) bisa ikut.
+Latency respons, bit error dan slave diam bisa diatur per simulator
+maupun per slave.
+
+Contoh:
+    sim = ModbusSimulator([XYMD02(1), RK300_02B(2), AnSens0105(10)], bit_error_rate=0.001)
+    uart = sim.attach(FakeUART(baudrate=9600))
+    bus = ModbusRTU(uart, de_re=FakePin(), baudrate=9600)
+
+    $ python modbus_sim.py --bench [--seconds N]      # benchmark master + poll scheduler
+    $ python modbus_sim.py --pty                      # simulator di /dev/pts/N
+    $ python modbus_sim.py --selftest                 # cek master vs simulator, exit 1 jika gagal
+"""
+import random
+import struct
+
+from checksum import crc16_modbus
+from modbus_frame import check_crc, READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, \
+                         READ_INPUT_REGISTERS, WRITE_SINGLE_COIL, WRITE_SINGLE_REGISTER, \
+                         WRITE_MULTIPLE_COILS, WRITE_MULTIPLE_REGISTERS
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+
+
+# ============ Slave ============
+class SimSlave:
+    """Register bank generik: register/bit yang tidak ada dijawab exception 0x02."""
+
+    def __init__(self, address, holding=None, input=None, coils=None, discrete=None,
+                 baudrate=9600, parity=None, latency_ms=None):
+        """
+        Args:
+            holding, input: {alamat: nilai} atau jumlah register (diisi 0)
+            coils, discrete: {alamat: 0/1} atau jumlah bit
+            latency_ms: Latency khusus slave ini (None = ikut simulator)
+        """
+        self.address = address
+        self.baudrate = baudrate
+        self.parity = parity
+        self.latency_ms = latency_ms
+        self.silent = False
+        self.holding = self._bank(holding)
+        self.input = self._bank(input)
+        self.coils = self._bank(coils)
+        self.discrete = self._bank(discrete)
+        self.requests = 0
+
+    def __repr__(self):
+        return f"<{type(self).__name__} 0x{self.address:02X} @ {self.baudrate}>"
+
+    # ============ PUBLIC ============
+    def update(self):
+        """Dipanggil sebelum tiap request; turunan mengubah nilai sensor di sini."""
+
+    def handle(self, pdu):
+        """PDU request -> PDU respons."""
+        self.requests += 1
+        self.update()
+        function = pdu[0]
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            address, count = struct.unpack_from(">HH", pdu, 1)
+            bank = self.holding if function == READ_HOLDING_REGISTERS else self.input
+            if not 1 <= count <= 125:
+                return self._exception(function, ILLEGAL_DATA_VALUE)
+            values = self._read(bank, address, count)
+            if values is None:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            return struct.pack(">BB%dH" % count, function, 2 * count, *values)
+
+        if function in (READ_COILS, READ_DISCRETE_INPUTS):
+            address, count = struct.unpack_from(">HH", pdu, 1)
+            bank = self.coils if function == READ_COILS else self.discrete
+            if not 1 <= count <= 2000:
+                return self._exception(function, ILLEGAL_DATA_VALUE)
+            bits = self._read(bank, address, count)
+            if bits is None:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            packed = bytearray((count + 7) // 8)
+            for i, bit in enumerate(bits):
+                if bit:
+                    packed[i >> 3] |= 1 << (i & 7)
+            return bytes((function, len(packed))) + packed
+
+        if function == WRITE_SINGLE_REGISTER:
+            address, value = struct.unpack_from(">HH", pdu, 1)
+            if address not in self.holding:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            self.write_register(address, value)
+            return bytes(pdu[:5])
+
+        if function == WRITE_SINGLE_COIL:
+            address, value = struct.unpack_from(">HH", pdu, 1)
+            if address not in self.coils:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            self.coils[address] = 1 if value == 0xFF00 else 0
+            return bytes(pdu[:5])
+
+        if function == WRITE_MULTIPLE_REGISTERS:
+            address, count = struct.unpack_from(">HH", pdu, 1)
+            if self._read(self.holding, address, count) is None:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            for i, value in enumerate(struct.unpack_from(">%dH" % count, pdu, 6)):
+                self.write_register(address + i, value)
+            return bytes(pdu[:5])
+
+        if function == WRITE_MULTIPLE_COILS:
+            address, count = struct.unpack_from(">HH", pdu, 1)
+            if self._read(self.coils, address, count) is None:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            for i in range(count):
+                self.coils[address + i] = (pdu[6 + (i >> 3)] >> (i & 7)) & 1
+            return bytes(pdu[:5])
+
+        return self._exception(function, ILLEGAL_FUNCTION)
+
+    def write_register(self, address, value):
+        self.holding[address] = value & 0xFFFF
+
+    # ============ PRIVATE ============
+    def _bank(self, spec):
+        if spec is None:
+            return {}
+        if isinstance(spec, int):
+            return {i: 0 for i in range(spec)}
+        return dict(spec)
+
+    def _read(self, bank, address, count):
+        try:
+            return [bank[address + i] for i in range(count)]
+        except KeyError:
+            return None
+
+    def _exception(self, function, code):
+        return bytes((function | 0x80, code))
+
+
+class XYMD02(SimSlave):
+    """
+    Sensor suhu/kelembaban XY-MD02: input register 1-2 (x0.1), juga holding
+    0-1 seperti dibaca tool ganti address. Register 0x07D0 (baudrate),
+    0x07D1 (address), 0x07D2 (parity) berlaku setelah respons terkirim.
+    """
+    BAUDRATES = (2400, 4800, 9600, 19200)
+
+    def __init__(self, address=1, temperature=25.0, humidity=60.0, **kwargs):
+        super().__init__(address, holding={0: 0, 1: 0, 0x07D0: 2, 0x07D1: address, 0x07D2: 0},
+                         input={1: 0, 2: 0}, **kwargs)
+        self.temperature = temperature
+        self.humidity = humidity
+
+    def update(self):
+        self.temperature += random.uniform(-0.05, 0.05)
+        self.humidity += random.uniform(-0.1, 0.1)
+        temperature = int(round(self.temperature * 10)) & 0xFFFF
+        humidity = int(round(self.humidity * 10))
+        self.input[1] = self.holding[0] = temperature
+        self.input[2] = self.holding[1] = humidity
+
+    def write_register(self, address, value):
+        super().write_register(address, value)
+        if address == 0x07D1 and 1 <= value <= 247:
+            self.address = value
+        elif address == 0x07D0 and value < len(self.BAUDRATES):
+            self.baudrate = self.BAUDRATES[value]
+        elif address == 0x07D2:
+            self.parity = (None, 0, 1)[value] if value < 3 else self.parity
+
+
+class RK300_02B(SimSlave):
+    """Sensor debu RK300-02B: holding 0-5 (PM1.0, PM2.5, PM10, reserved)."""
+
+    def __init__(self, address=1, pm2_5=35, **kwargs):
+        super().__init__(address, holding=6, **kwargs)
+        self.pm2_5 = pm2_5
+
+    def update(self):
+        self.pm2_5 = max(0, self.pm2_5 + random.randint(-2, 2))
+        self.holding[0] = self.pm2_5 * 7 // 10
+        self.holding[1] = self.pm2_5
+        self.holding[2] = self.pm2_5 * 3 // 2
+
+
+class AnSens0105(SimSlave):
+    """Radar level air AnSens-0105: holding 0 = jarak (cm)."""
+
+    def __init__(self, address=0x0A, distance_cm=250, **kwargs):
+        super().__init__(address, holding=1, **kwargs)
+        self.distance_cm = distance_cm
+
+    def update(self):
+        self.distance_cm = max(0, self.distance_cm + random.randint(-1, 1))
+        self.holding[0] = self.distance_cm
+
+
+# ============ Bus ============
+class ModbusSimulator:
+    def __init__(self, slaves, latency_ms=5, jitter_ms=0, bit_error_rate=0.0, silence_rate=0.0, seed=None):
+        """
+        Args:
+            slaves: List SimSlave di bus
+            latency_ms, jitter_ms: Waktu tanggap slave (+ acak 0..jitter)
+            bit_error_rate: Peluang tiap byte respons terkena 1 bit flip
+            silence_rate: Peluang slave tidak menjawab sama sekali
+        """
+        self.slaves = list(slaves)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bit_error_rate = bit_error_rate
+        self.silence_rate = silence_rate
+        self.uart = None
+        self.stats = {"requests": 0, "replies": 0, "corrupted": 0, "silenced": 0, "line_mismatch": 0}
+        if seed is not None:
+            random.seed(seed)
+
+    # ============ PUBLIC ============
+    def attach(self, uart):
+        """Pasang simulator sebagai handler FakeUART, kembalikan uart-nya."""
+        self.uart = uart
+        uart.handler = self.handler
+        return uart
+
+    def slave(self, address):
+        for slave in self.slaves:
+            if slave.address == address:
+                return slave
+        return None
+
+    def handler(self, frame):
+        """Frame request -> `(reply, latency_ms)` atau None (tidak ada jawaban)."""
+        self.stats["requests"] += 1
+        if len(frame) < 4 or not check_crc(frame, len(frame)):
+            return None
+        address = frame[0]
+        targets = self.slaves if address == 0 else [s for s in self.slaves if s.address == address]
+        reply = None
+        latency_ms = self.latency_ms
+        for slave in targets:
+            if self.uart is not None and (self.uart.baudrate, self.uart.parity) != (slave.baudrate, slave.parity):
+                # setting serial beda: slave hanya melihat sampah
+                self.stats["line_mismatch"] += 1
+                continue
+            pdu = slave.handle(frame[1:-2])
+            if address == 0 or slave.silent:
+                continue
+            if self.silence_rate and random.random() < self.silence_rate:
+                self.stats["silenced"] += 1
+                continue
+            reply = self._seal(address, pdu)
+            if slave.latency_ms is not None:
+                latency_ms = slave.latency_ms
+        if reply is None:
+            return None
+        self.stats["replies"] += 1
+        if self.jitter_ms:
+            latency_ms += random.uniform(0, self.jitter_ms)
+        return self._corrupt(reply), latency_ms
+
+    # ============ PRIVATE ============
+    def _seal(self, address, pdu):
+        frame = bytearray(1 + len(pdu) + 2)
+        frame[0] = address
+        frame[1:1 + len(pdu)] = pdu
+        crc = crc16_modbus(frame, 0, len(frame) - 2)
+        frame[-2] = crc & 0xFF
+        frame[-1] = crc >> 8
+        return frame
+
+    def _corrupt(self, frame):
+        if not self.bit_error_rate:
+            return bytes(frame)
+        corrupted = False
+        for i in range(len(frame)):
+            if random.random() < self.bit_error_rate:
+                frame[i] ^= 1 << random.randrange(8)
+                corrupted = True
+        if corrupted:
+            self.stats["corrupted"] += 1
+        return bytes(frame)
+
+
+# ============ pty ============
+def serve_pty(sim, baudrate=9600, parity=None):
+    """
+    Jalankan simulator di pasangan pty (thread latar). Kembalikan path sisi
+    slave, mis. /dev/pts/5, untuk dibuka master lain. Frame dipisah dengan
+    jeda 3.5 karakter seperti di kabel.
+    """
+    import os
+    import select
+    import threading
+    import time
+
+    master_fd, slave_fd = os.openpty()
+    path = os.ttyname(slave_fd)
+    bits_per_char = 1 + 8 + (0 if parity is None else 1) + 1
+    char_s = bits_per_char / baudrate
+    gap_s = 0.00175 if baudrate > 19200 else 3.5 * char_s
+
+    class _Line:
+        pass
+
+    line = _Line()
+    line.baudrate = baudrate
+    line.parity = parity
+    sim.uart = line
+
+    def loop():
+        buf = b""
+        while True:
+            ready, _, _ = select.select([master_fd], [], [], gap_s if buf else None)
+            if ready:
+                buf += os.read(master_fd, 256)
+                continue
+            result = sim.handler(buf)
+            buf = b""
+            if result:
+                reply, latency_ms = result
+                time.sleep(latency_ms / 1000)
+                os.write(master_fd, reply)
+
+    threading.Thread(target=loop, daemon=True).start()
+    return path
+
+
+# ============ CLI ============
+def default_bus(**kwargs):
+    return ModbusSimulator([XYMD02(1), RK300_02B(2), AnSens0105(0x0A),
+                            SimSlave(20, holding=100, input=100, coils=64, discrete=64)], **kwargs)
+
+
+def benchmark(seconds=10, baudrate=9600, **kwargs):
+    """Jalankan PollScheduler di atas simulator, cetak throughput & statistik bus."""
+    import asyncio
+    from fake_uart import FakeUART, FakePin
+    from modbus import ModbusRTU
+    from modbus_poll import PollScheduler
+
+    sim = default_bus(**kwargs)
+    uart = sim.attach(FakeUART(baudrate=baudrate))
+    bus = ModbusRTU(uart, de_re=FakePin(), baudrate=baudrate)
+    devices = [
+        {"name": "xy1", "slave": 1, "profile": "xy_md02", "interval": 1},
+        {"name": "dust1", "slave": 2, "profile": "rk300_02b", "interval": 1},
+        {"name": "radar1", "slave": 0x0A, "profile": "ansens_0105", "interval": 0.5},
+        {"name": "bank", "slave": 20, "interval": 0.5, "points": [
+            {"name": f"r{i}", "function": 3, "address": i} for i in range(0, 40, 3)
+        ]},
+    ]
+    values = {}
+    poller = PollScheduler(bus, devices, on_values=lambda device, named: values.update(
+        {f"{device}.{k}": v for k, v in named.items()}))
+
+    async def run():
+        task = asyncio.create_task(poller.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+
+    asyncio.run(run())
+    print(f"{poller.transactions} transactions in {seconds}s ({poller.transactions / seconds:.1f}/s)")
+    print("simulator:", sim.stats)
+    stats = bus.stats()
+    print("bus utilisation:", stats["utilisation"])
+    for slave, stat in stats["slaves"].items():
+        print(f"  slave {slave}: req {stat['requests']} timeout {stat['timeouts']} "
+              f"crc {stat['crc_errors']} avg {stat['latency_avg_ms']} ms")
+    print("values:", {k: values[k] for k in sorted(values)[:8]})
+    return stats
+
+
+def selftest():
+    """
+    Cek cepat stack RTU master terhadap simulator: FC 01-06/15/16 (tulis lalu
+    baca balik), respons exception, timeout slave diam, dan benchmark singkat.
+    Kembalikan list kegagalan (kosong = lulus).
+    """
+    import asyncio
+    from fake_uart import FakeUART, FakePin
+    from modbus import ModbusRTU, ModbusTimeout, ModbusExceptionResponse
+
+    slave = SimSlave(7, holding=16, input={0: 111, 1: 222}, coils=16, discrete={0: 1, 1: 0, 2: 1},
+                     baudrate=19200)
+    uart = ModbusSimulator([slave], latency_ms=2).attach(FakeUART(baudrate=19200))
+    bus = ModbusRTU(uart, de_re=FakePin(), baudrate=19200, timeout_ms=200)
+    failures = []
+
+    def check(name, got, expected):
+        if list(got) != list(expected):
+            failures.append(f"{name}: got {list(got)}, expected {list(expected)}")
+
+    async def run():
+        await bus.write_multiple_registers(7, 2, [0x1234, 0xBEEF])            # FC 16
+        check("fc16/fc03", await bus.read_holding_registers(7, 2, 2), [0x1234, 0xBEEF])
+        await bus.write_single_register(7, 5, 4321)                           # FC 06
+        check("fc06/fc03", await bus.read_holding_registers(7, 5, 1), [4321])
+        check("fc04", await bus.read_input_registers(7, 0, 2), [111, 222])
+        await bus.write_single_coil(7, 3, 1)                                  # FC 05
+        check("fc05/fc01", await bus.read_coils(7, 3, 1), [1])
+        await bus.write_multiple_coils(7, 6, [1, 0, 1, 1, 0, 0, 1, 0, 1])     # FC 15
+        check("fc15/fc01", await bus.read_coils(7, 6, 9), [1, 0, 1, 1, 0, 0, 1, 0, 1])
+        check("fc02", await bus.read_discrete_inputs(7, 0, 3), [1, 0, 1])
+
+        try:
+            await bus.read_holding_registers(7, 100, 1)
+            failures.append("exception: no ModbusExceptionResponse")
+        except ModbusExceptionResponse as e:
+            check("exception code", [e.code], [ILLEGAL_DATA_ADDRESS])
+
+        slave.silent = True
+        try:
+            await bus.read_holding_registers(7, 0, 1)
+            failures.append("timeout: no ModbusTimeout")
+        except ModbusTimeout:
+            pass
+        slave.silent = False
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        failures.append(f"error: {e!r}")
+
+    stats = benchmark(seconds=1)
+    if not sum(stat["responses"] for stat in stats["slaves"].values()):
+        failures.append("benchmark: no responses")
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    if "--pty" in args:
+        import time
+        print("Simulator pty:", serve_pty(default_bus()))
+        while True:
+            time.sleep(1)
+    elif "--selftest" in args:
+        failures = selftest()
+        for failure in failures:
+            print("FAIL", failure)
+        print("selftest", "FAILED" if failures else "OK")
+        sys.exit(1 if failures else 0)
+    elif "--bench" in args:
+        try:
+            seconds = float(args[args.index("--seconds") + 1]) if "--seconds" in args else 10
+        except (IndexError, ValueError):
+            sys.exit("--seconds needs a number")
+        benchmark(seconds=seconds, bit_error_rate=0.0005, silence_rate=0.01, jitter_ms=3)
+    else:
+        sys.exit("usage: modbus_sim.py --bench [--seconds N] | --selftest | --pty")
@@ -0,0 +1,233 @@
+"""
+Mode slave Modbus RTU: box ini dipolling PLC/SCADA upstream lewat RS485.
+
+Nilai telemetry dipetakan ke register image (bytearray big-endian) yang
+di-update setiap sampel baru masuk, sehingga melayani FC 03/04 cukup satu
+slice buffer + CRC, tanpa hitung ulang apa pun. Image yang sama dipakai
+untuk FC 03 dan FC 04 (read-only, write dijawab exception).
+
+Jika port mendukung UART.IRQ_RXIDLE, request diproses langsung di callback
+IRQ (dijadwalkan di antara bytecode), jadi tetap menjawab tepat waktu meski
+handler web sedang sibuk. Tanpa IRQ dipakai loop uasyncio biasa. Respons
+hanya dimasukkan ke UART; DE/RE dilepas oleh task uasyncio di akhir frame,
+jadi tidak ada yang menunggu selama frame terkirim. Port dengan mode RS485
+hardware (DE dikendalikan UART) cukup memakai de_re=None.
+
+Format map (config `rs485:slave`):
+    "map": [
+        {"key": "xy1.temperature", "address": 0, "type": "s16", "scale": 10},
+        {"key": "dust1.pm2_5", "address": 1}
+    ]
+"""
+import struct
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from ticks import ticks_us, ticks_add, ticks_diff
+from checksum import crc16_modbus
+from modbus_frame import READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS, \
+                         WRITE_MULTIPLE_COILS, check_crc
+from modbus_profile import TYPES
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+
+# batas nilai tipe integer (min, max) untuk clamp sebelum pack
+_INF = float("inf")
+_LIMITS = {"H": (0, 0xFFFF), "h": (-0x8000, 0x7FFF), "I": (0, 0xFFFFFFFF), "i": (-0x80000000, 0x7FFFFFFF)}
+
+
+class RegisterImage:
+    def __init__(self, mapping):
+        """
+        Args:
+            mapping: List {"key", "address", "type", "scale"} (lihat docstring modul)
+        """
+        self._map = {}
+        count = 0
+        for entry in mapping:
+            code, size = TYPES[entry.get("type", "u16")]
+            address = entry["address"]
+            self._map[entry["key"]] = (2 * address, ">" + code, entry.get("scale", 1), code)
+            count = max(count, address + size)
+        self.count = count
+        self.data = bytearray(2 * count)
+        self.view = memoryview(self.data)
+        self.updated = 0
+
+    # ============ PUBLIC ============
+    def update(self, key, value):
+        """Tulis nilai telemetry ke register-nya (diabaikan jika tidak dipetakan)."""
+        entry = self._map.get(key)
+        if entry is None or value is None:
+            return False
+        offset, fmt, scale, code = entry
+        value = value * scale
+        limits = _LIMITS.get(code)
+        if limits is not None:
+            if value != value or value in (_INF, -_INF):
+                return False  # NaN/inf tidak punya representasi integer
+            value = min(max(int(round(value)), limits[0]), limits[1])
+        struct.pack_into(fmt, self.data, offset, value)
+        self.updated += 1
+        return True
+
+    def update_many(self, values, prefix=""):
+        for name, value in values.items():
+            self.update(prefix + name, value)
+
+
+class ModbusSlave:
+    def __init__(self, uart, address, image, de_re=None, baudrate=9600, bits=8, parity=None, stop=1):
+        """
+        Args:
+            uart: machine.UART (atau FakeUART)
+            address: Slave address box ini (1-247)
+            image: RegisterImage yang dilayani
+            de_re: Pin DE/RE transceiver, boleh None
+        """
+        self.uart = uart
+        self.address = address
+        self.image = image
+        self.de_re = de_re
+        bits_per_char = 1 + bits + (0 if parity is None else 1) + stop
+        self.char_us = (bits_per_char * 1_000_000 + baudrate - 1) // baudrate
+        self.t35_us = 1750 if baudrate > 19200 else (self.char_us * 7 + 1) // 2
+        self._rx = bytearray(256)
+        self._rx_mv = memoryview(self._rx)
+        self._pos = 0
+        self._last_rx = ticks_us()
+        self._tx = bytearray(256)
+        self._tx_mv = memoryview(self._tx)
+        self._tx_done = None  # akhir frame yang sedang dikirim (ticks_us)
+        self.stats = {"requests": 0, "responses": 0, "exceptions": 0, "crc_errors": 0, "ignored": 0}
+        if de_re is not None:
+            de_re.value(0)
+
+    # ============ PUBLIC ============
+    def start_irq(self):
+        """Pakai IRQ RX idle jika tersedia. False jika port tidak mendukung."""
+        idle = getattr(type(self.uart), "IRQ_RXIDLE", None)
+        if idle is None or not hasattr(self.uart, "irq"):
+            return False
+        self.uart.irq(self._on_idle, idle)
+        return True
+
+    async def run(self):
+        """Loop penerima async (fallback tanpa IRQ)."""
+        if hasattr(self.uart, "stream"):
+            reader = self.uart.stream()
+        else:
+            reader = asyncio.StreamReader(self.uart)
+        while True:
+            n = await reader.readinto(self._rx_mv[self._pos:])
+            if n:
+                self._feed(n)
+
+    def handle(self, frame, n):
+        """
+        Proses satu request lengkap di frame[:n], kembalikan panjang respons
+        di buffer kirim (0 = tidak perlu dijawab).
+        """
+        if n < 4 or frame[0] != self.address:
+            if n >= 4 and frame[0] != 0:
+                self.stats["ignored"] += 1
+            return 0
+        if not check_crc(frame, n):
+            self.stats["crc_errors"] += 1
+            return 0
+        self.stats["requests"] += 1
+        function = frame[1]
+        tx = self._tx
+        tx[0] = self.address
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS) and n == 8:
+            start = (frame[2] << 8) | frame[3]
+            count = (frame[4] << 8) | frame[5]
+            if count < 1 or count > 125 or start + count > self.image.count:
+                return self._exception(function, ILLEGAL_DATA_ADDRESS)
+            tx[1] = function
+            tx[2] = 2 * count
+            tx[3:3 + 2 * count] = self.image.view[2 * start:2 * (start + count)]
+            return self._seal(3 + 2 * count)
+        return self._exception(function, ILLEGAL_FUNCTION)
+
+    # ============ PRIVATE: Terima ============
+    def _on_idle(self, uart):
+        # callback IRQ: baca semua byte yang ada lalu proses
+        while uart.any():
+            n = uart.readinto(self._rx_mv[self._pos:])
+            if not n:
+                break
+            self._feed(n)
+
+    def _feed(self, n):
+        now = ticks_us()
+        if self._pos and ticks_diff(now, self._last_rx) > self.t35_us + n * self.char_us:
+            # jeda > 3.5 karakter di tengah frame: sisa frame lama dibuang
+            self._rx[0:n] = self._rx[self._pos:self._pos + n]
+            self._pos = 0
+        self._last_rx = now
+        self._pos += n
+        needed = self._request_length()
+        if needed is None or self._pos < needed:
+            if self._pos >= len(self._rx):
+                self._pos = 0
+            return
+        m = self.handle(self._rx, needed)
+        self._pos = 0
+        if m:
+            self._send(m)
+
+    def _request_length(self):
+        rx = self._rx
+        pos = self._pos
+        if pos < 2:
+            return None
+        function = rx[1]
+        if function in (WRITE_MULTIPLE_REGISTERS, WRITE_MULTIPLE_COILS):
+            return 9 + rx[6] if pos >= 7 else None
+        return 8
+
+    # ============ PRIVATE: Kirim ============
+    def _exception(self, function, code):
+        self.stats["exceptions"] += 1
+        self._tx[1] = function | 0x80
+        self._tx[2] = code
+        return self._seal(3)
+
+    def _seal(self, n):
+        crc = crc16_modbus(self._tx, 0, n)
+        self._tx[n] = crc & 0xFF
+        self._tx[n + 1] = crc >> 8
+        return n + 2
+
+    def _send(self, n):
+        # dipanggil dari IRQ/loop: hanya mulai kirim, tidak menunggu frame selesai
+        self.stats["responses"] += 1
+        if self.de_re is not None:
+            self.de_re.value(1)
+        start = ticks_us()
+        self.uart.write(self._tx_mv[:n])
+        if self.de_re is not None:
+            done = self._tx_done = ticks_add(start, n * self.char_us)
+            asyncio.create_task(self._release(done))
+
+    async def _release(self, done):
+        # sebagian besar waktu kirim ditunggu tanpa memblok loop,
+        # sisa < 1.5 ms di-spin supaya DE/RE turun tepat di akhir frame
+        remaining = ticks_diff(done, ticks_us())
+        if remaining > 2000:
+            await asyncio.sleep((remaining - 1500) / 1_000_000)
+        if done != self._tx_done:
+            return  # sudah ada respons baru, DE/RE dilepas oleh task-nya
+        while ticks_diff(done, ticks_us()) > 0:
+            pass
+        txdone = getattr(self.uart, "txdone", None)
+        if txdone is not None:
+            while not txdone():
+                pass
+        self._tx_done = None
+        self.de_re.value(0)
@@ -0,0 +1,189 @@
+"""
+Gateway Modbus TCP -> RTU: server TCP (port 502) yang meneruskan request ke
+bus RS485 lewat master async bersama (ModbusRTU.transact).
+
+- Tiap koneksi memproses satu request pada satu waktu dan bus.lock antri
+  FIFO, jadi client yang polling agresif tidak bisa menyerobot client lain.
+- Read identik (unit + PDU sama) yang sedang berjalan digabung: hanya satu
+  transaksi RTU, client lain menunggu hasil yang sama.
+- Hasil read disimpan di cache ber-TTL pendek, sehingga beberapa SCADA yang
+  polling register sama tidak melipatgandakan traffic di bus serial.
+- Write diteruskan langsung dan menghapus cache milik unit tersebut.
+
+Contoh:
+    gateway = ModbusTCPGateway(rs485, cache_ms=500)
+    await gateway.serve(port=502)
+"""
+import struct
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from ticks import ticks_ms, ticks_add, ticks_diff
+from modbus import ModbusError, ModbusTimeout
+from modbus_frame import READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS
+
+_READ_FUNCTIONS = (READ_COILS, READ_DISCRETE_INPUTS, READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS)
+
+# exception code gateway (spesifikasi Modbus)
+ILLEGAL_FUNCTION = 0x01
+SERVER_DEVICE_FAILURE = 0x04
+GATEWAY_PATH_UNAVAILABLE = 0x0A
+GATEWAY_TARGET_FAILED = 0x0B
+
+
+class _Pending:
+    """Transaksi RTU yang sedang berjalan, ditunggu oleh request identik."""
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.result = None
+        self.error = None
+
+
+class ModbusTCPGateway:
+    def __init__(self, bus, cache_ms=500, cache_size=32, max_clients=4):
+        """
+        Args:
+            bus: ModbusRTU bersama
+            cache_ms: Umur respons read di cache (0 = tanpa cache)
+            cache_size: Jumlah entri cache maksimal
+            max_clients: Koneksi TCP simultan maksimal
+        """
+        self.bus = bus
+        self.cache_ms = cache_ms
+        self.cache_size = cache_size
+        self.max_clients = max_clients
+        self.clients = 0
+        self._cache = {}    # key -> (expire_ms, pdu)
+        self._pending = {}  # key -> _Pending
+        self.stats = {"requests": 0, "transactions": 0, "cache_hits": 0, "coalesced": 0, "errors": 0}
+
+    # ============ PUBLIC ============
+    async def serve(self, host="0.0.0.0", port=502):
+        server = await asyncio.start_server(self._handle_client, host, port)
+        print(f"Modbus TCP gateway running on port {port}")
+        await server.wait_closed()
+
+    async def request(self, unit, pdu):
+        """
+        Proses satu PDU untuk slave `unit`, kembalikan PDU respons (bytes).
+        Error bus dijadikan respons exception gateway.
+        """
+        self.stats["requests"] += 1
+        function = pdu[0]
+        if unit == 0:
+            # broadcast tidak punya respons, tidak bisa dipetakan ke TCP
+            return bytes((function | 0x80, GATEWAY_PATH_UNAVAILABLE))
+        if function == 0 or function & 0x80:
+            # bukan function code: jangan diteruskan ke bus
+            return bytes((function | 0x80, ILLEGAL_FUNCTION))
+        try:
+            if function in _READ_FUNCTIONS:
+                return await self._read(unit, pdu)
+            self._invalidate(unit)
+            return await self._transact(unit, pdu)
+        except ModbusTimeout:
+            self.stats["errors"] += 1
+            return bytes((function | 0x80, GATEWAY_TARGET_FAILED))
+        except ModbusError as e:
+            self.stats["errors"] += 1
+            print(f"Modbus TCP unit {unit} fc {function}: {e}")
+            return bytes((function | 0x80, GATEWAY_TARGET_FAILED))
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Modbus TCP unit {unit} fc {function} failed:", e)
+            return bytes((function | 0x80, SERVER_DEVICE_FAILURE))
+
+    # ============ PRIVATE: Bus ============
+    async def _read(self, unit, pdu):
+        key = bytes((unit,)) + bytes(pdu)
+        now = ticks_ms()
+        cached = self._cache.get(key)
+        if cached is not None and ticks_diff(cached[0], now) > 0:
+            self.stats["cache_hits"] += 1
+            return cached[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            await pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        pending = self._pending[key] = _Pending()
+        try:
+            result = await self._transact(unit, pdu)
+            pending.result = result
+            if self.cache_ms and not result[0] & 0x80:
+                self._store(key, result)
+            return result
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            # transaksi dibatalkan: request yang menumpang tetap dapat error
+            if pending.result is None and pending.error is None:
+                pending.error = ModbusError("transaction aborted")
+            del self._pending[key]
+            pending.event.set()
+
+    async def _transact(self, unit, pdu):
+        self.stats["transactions"] += 1
+        return await self.bus.transact(unit, pdu)
+
+    def _store(self, key, result):
+        cache = self._cache
+        if len(cache) >= self.cache_size and key not in cache:
+            now = ticks_ms()
+            for k in [k for k, v in cache.items() if ticks_diff(v[0], now) <= 0]:
+                del cache[k]
+            if len(cache) >= self.cache_size:
+                # buang yang paling cepat kedaluwarsa
+                oldest = None
+                for k, v in cache.items():
+                    if oldest is None or ticks_diff(v[0], cache[oldest][0]) < 0:
+                        oldest = k
+                del cache[oldest]
+        cache[key] = (ticks_add(ticks_ms(), self.cache_ms), result)
+
+    def _invalidate(self, unit):
+        for key in [k for k in self._cache if k[0] == unit]:
+            del self._cache[key]
+
+    # ============ PRIVATE: TCP ============
+    async def _handle_client(self, reader, writer):
+        if self.clients >= self.max_clients:
+            await self._close(writer)
+            return
+        self.clients += 1
+        try:
+            while True:
+                # MBAP: transaction id, protocol id, length, unit id
+                header = await reader.readexactly(7)
+                tid, protocol, length, unit = struct.unpack(">HHHB", header)
+                if length < 2 or length > 254:
+                    break
+                pdu = await reader.readexactly(length - 1)
+                if protocol != 0:
+                    continue
+                resp = await self.request(unit, pdu)
+                writer.write(struct.pack(">HHHB", tid, 0, len(resp) + 1, unit) + resp)
+                await writer.drain()
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            print("Modbus TCP client error:", e)
+        finally:
+            self.clients -= 1
+            await self._close(writer)
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
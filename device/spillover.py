@@ -0,0 +1,182 @@
+import os
+import time
+import struct
+
+# Ring buffer log di flash internal, dipakai saat /sd tidak tersedia.
+# Terdiri dari beberapa file "slot" append-only yang diisi bergiliran sampai
+# `slot_size`; slot yang dipakai ulang dihapus lalu dibuat baru. Sampel
+# dikumpulkan dulu di RAM dan baru di-append per blok supaya flash tidak
+# ditulis setiap sampel.
+# Layout slot: [magic 4 byte][generation 4 byte][record "date|line\n" ...]
+_MAGIC = b"PRNG"
+_SLOT_HEADER_FMT = "<4sI"
+_SLOT_HEADER_SIZE = 8
+_DRAIN_BATCH = 32
+
+
+class FlashRing:
+    def __init__(self, folder="/spill", slots=4, slot_size=16 * 1024, block_size=512, flush_interval=60):
+        """
+        Args:
+            folder: Folder slot di flash internal
+            slots: Jumlah slot (file) dalam ring
+            slot_size: Ukuran tiap slot (byte)
+            block_size: Ukuran buffer RAM sebelum ditulis ke flash
+            flush_interval: Batas waktu (detik) data boleh tertahan di RAM
+        """
+        self.folder = folder
+        self.slots = slots
+        self.slot_size = slot_size
+        self.flush_interval = flush_interval
+        self.dropped = 0  # jumlah slot lama yang tertimpa karena ring penuh
+
+        self._buf = bytearray(block_size)
+        self._buf_len = 0
+        self._buf_since = 0
+        self._header = bytearray(_SLOT_HEADER_SIZE)
+
+        self._gens = [0] * slots   # 0 = kosong / sudah di-drain
+        self._slot = None          # slot aktif
+        self._offset = 0           # posisi tulis di slot aktif
+        self._cursor = {}          # slot -> offset record pertama yang belum di-drain
+
+        try:
+            if folder.strip("/") not in os.listdir("/"):
+                os.mkdir(folder)
+        except OSError:
+            pass
+        self._recover()
+
+    # ============ PUBLIC ============
+    def append(self, date, line):
+        """Simpan satu sampel (di-buffer di RAM)."""
+        record = f"{date}|{line}\n".encode()
+        if len(record) > len(self._buf):
+            record = record[:len(self._buf) - 1] + b"\n"
+        if self._buf_len + len(record) > len(self._buf):
+            self.flush()
+        if self._buf_len == 0:
+            self._buf_since = time.time()
+        self._buf[self._buf_len:self._buf_len + len(record)] = record
+        self._buf_len += len(record)
+
+        if time.time() - self._buf_since >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Tulis buffer RAM ke slot aktif (pindah slot jika penuh)."""
+        if self._buf_len == 0:
+            return
+        if self._slot is None or self._offset + self._buf_len > self.slot_size:
+            self._next_slot()
+        with open(self._slot_path(self._slot), "ab") as f:
+            f.write(memoryview(self._buf)[:self._buf_len])
+        self._offset += self._buf_len
+        self._buf_len = 0
+
+    def pending(self):
+        return self._buf_len > 0 or any(self._gens)
+
+    def drain(self, sink):
+        """
+        Pindahkan semua data ke `sink` (mis. DailyLog) secara bulk.
+        `sink.backfill(date, lines)` dipanggil per kelompok tanggal. Jika sink
+        gagal di tengah jalan, drain berikutnya melanjutkan dari record
+        pertama yang belum terkirim.
+        """
+        self.flush()
+        order = sorted((gen, slot) for slot, gen in enumerate(self._gens) if gen)
+        total = 0
+        for _, slot in order:
+            total += self._drain_slot(slot, sink)
+            self._invalidate(slot)
+        self._slot = None
+        self._offset = 0
+        if total:
+            print(f"Spillover drained: {total} records")
+        return total
+
+    # ============ PRIVATE: Slot ============
+    def _slot_path(self, slot):
+        return f"{self.folder}/ring_{slot}.bin"
+
+    def _recover(self):
+        for slot in range(self.slots):
+            try:
+                with open(self._slot_path(slot), "rb") as f:
+                    n = f.readinto(self._header)
+                magic, gen = struct.unpack_from(_SLOT_HEADER_FMT, self._header, 0)
+                self._gens[slot] = gen if n == _SLOT_HEADER_SIZE and magic == _MAGIC else 0
+            except OSError:
+                self._gens[slot] = 0
+
+        newest = max(range(self.slots), key=lambda s: self._gens[s])
+        if self._gens[newest]:
+            self._slot = newest
+            self._offset = os.stat(self._slot_path(newest))[6]
+            print(f"Spillover pending in {sum(1 for g in self._gens if g)} slot(s)")
+
+    def _next_slot(self):
+        slot = 0 if self._slot is None else (self._slot + 1) % self.slots
+        if self._slot is None:
+            # mulai dari slot kosong pertama, kalau ada
+            for s in range(self.slots):
+                if not self._gens[s]:
+                    slot = s
+                    break
+        if self._gens[slot]:
+            self.dropped += 1
+            print(f"Spillover ring full, overwriting slot {slot}")
+
+        # slot dibuat ulang (bukan ditimpa di tempat) supaya LittleFS cukup
+        # membuang blok lama, tanpa copy-on-write seluruh isi slot
+        gen = max(self._gens) + 1
+        self._invalidate(slot)
+        struct.pack_into(_SLOT_HEADER_FMT, self._header, 0, _MAGIC, gen)
+        with open(self._slot_path(slot), "wb") as f:
+            f.write(self._header)
+
+        self._gens[slot] = gen
+        self._slot = slot
+        self._offset = _SLOT_HEADER_SIZE
+
+    def _invalidate(self, slot):
+        try:
+            os.remove(self._slot_path(slot))
+        except OSError:
+            pass
+        self._gens[slot] = 0
+        self._cursor.pop(slot, None)
+
+    def _drain_slot(self, slot, sink):
+        count = 0
+        date = None
+        lines = []
+        rest = b""
+        mv = memoryview(self._buf)
+        pos = self._cursor.get(slot, _SLOT_HEADER_SIZE)
+        parsed = pos     # akhir record terakhir yang sudah di-parse
+        with open(self._slot_path(slot), "rb") as f:
+            f.seek(pos)
+            while True:
+                n = f.readinto(mv)
+                if not n:
+                    break
+                rest += bytes(mv[:n])
+                records = rest.split(b"\n")
+                rest = records.pop()
+                for record in records:
+                    rec_date, _, line = record.decode("utf-8", "ignore").partition("|")
+                    if rec_date != date or len(lines) >= _DRAIN_BATCH:
+                        if lines:
+                            sink.backfill(date, lines)
+                            count += len(lines)
+                            self._cursor[slot] = parsed
+                        date, lines = rec_date, []
+                    lines.append(line)
+                    parsed += len(record) + 1
+        if lines:
+            sink.backfill(date, lines)
+            count += len(lines)
+            self._cursor[slot] = parsed
+        return count
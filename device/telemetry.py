@@ -0,0 +1,216 @@
+"""
+Penyimpanan telemetry terpusat: satu ring buffer per channel di array
+yang dialokasikan sekali saat start.
+
+Semua worker (RS485, ADC, digital, UART) menulis ke sini, dan semua
+konsumen (logger, LCD, web API, uplink) membaca dari sini, jadi satu
+sensor tidak pernah dipolling dua kali untuk konsumen berbeda. Tiap sampel
+dapat nomor urut (seq) global yang naik terus, dipakai konsumen untuk
+mengambil hanya sampel baru.
+
+Store juga bisa dipakai seperti dict lama (`store["xy1.temperature"] = 25.1`,
+`store["xy1.temperature"]` = nilai terakhir).
+
+Contoh:
+    store = TelemetryStore(depth=32, max_channels=64)
+    store.append("xy1.temperature", 25.1)
+    store.snapshot()              # {"xy1.temperature": 25.1}
+    store.history("xy1.temperature", 10)  # [(seq, timestamp, value), ...]
+    await store.wait(since=seq, timeout_ms=25000)  # long-poll sampai ada sampel baru
+    EventStream(DeltaFeed(store))  # push delta lewat SSE (lihat microapi)
+"""
+import json
+import time
+from array import array
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+class TelemetryStore:
+    def __init__(self, depth=32, max_channels=64):
+        """
+        Args:
+            depth: Jumlah sampel terakhir yang disimpan per channel
+            max_channels: Jumlah channel maksimal (ukuran array tetap)
+        """
+        self.depth = depth
+        self.max_channels = max_channels
+        self.seq = 0  # seq sampel terakhir (0 = belum ada sampel)
+        self.names = []
+        self._index = {}
+        size = depth * max_channels
+        self._values = array("f", bytes(4 * size))
+        self._times = array("I", bytes(4 * size))
+        self._seqs = array("I", bytes(4 * size))
+        self._heads = array("H", bytes(2 * max_channels))   # slot berikutnya yang ditulis
+        self._counts = array("H", bytes(2 * max_channels))
+        self._listeners = []
+        self._event = None  # dibuat saat ada yang menunggu, dibuang setelah di-set
+        self.dropped = 0  # sampel ditolak karena channel penuh
+
+    # ============ PUBLIC: Tulis ============
+    def channel(self, name):
+        """Index channel `name`, didaftarkan jika belum ada (None jika penuh)."""
+        index = self._index.get(name)
+        if index is None:
+            if len(self.names) >= self.max_channels:
+                if not self.dropped:
+                    print(f"Telemetry full ({self.max_channels} channels), dropping {name}")
+                self.dropped += 1
+                return None
+            index = self._index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def append(self, name, value, timestamp=None):
+        """Tambah satu sampel (O(1), tanpa alokasi). Kembalikan seq-nya."""
+        index = self._index.get(name)
+        if index is None:
+            index = self.channel(name)
+            if index is None:
+                return 0
+        self.seq += 1
+        head = self._heads[index]
+        slot = index * self.depth + head
+        self._values[slot] = value
+        self._times[slot] = int(time.time()) if timestamp is None else timestamp
+        self._seqs[slot] = self.seq
+        self._heads[index] = head + 1 if head + 1 < self.depth else 0
+        if self._counts[index] < self.depth:
+            self._counts[index] += 1
+        for listener in self._listeners:
+            listener(name, value, self.seq)
+        if self._event is not None:
+            self._event.set()
+            self._event = None
+        return self.seq
+
+    def listen(self, callback):
+        """Panggil `callback(name, value, seq)` setiap sampel baru."""
+        self._listeners.append(callback)
+
+    async def wait(self, since, timeout_ms):
+        """Tunggu sampai ada sampel dengan seq > `since`. False jika timeout."""
+        if self.seq > since:
+            return True
+        if self._event is None:
+            self._event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    # ============ PUBLIC: Baca ============
+    def latest(self, name, default=None):
+        index = self._index.get(name)
+        if index is None or not self._counts[index]:
+            return default
+        return self._values[self._last_slot(index)]
+
+    def latest_sample(self, name):
+        """(seq, timestamp, value) terakhir channel, None jika kosong."""
+        index = self._index.get(name)
+        if index is None or not self._counts[index]:
+            return None
+        slot = self._last_slot(index)
+        return self._seqs[slot], self._times[slot], self._values[slot]
+
+    def snapshot(self, since=0):
+        """{name: value terakhir}; dengan `since`, hanya channel yang berubah setelah seq itu."""
+        result = {}
+        for index, name in enumerate(self.names):
+            if self._counts[index]:
+                slot = self._last_slot(index)
+                if self._seqs[slot] > since:
+                    result[name] = self._values[slot]
+        return result
+
+    def history(self, name, n=None, since=0):
+        """Sampel channel terlama -> terbaru sebagai [(seq, timestamp, value)]."""
+        index = self._index.get(name)
+        if index is None:
+            return []
+        count = self._counts[index]
+        if n is not None and n < count:
+            count = n
+        depth = self.depth
+        base = index * depth
+        start = self._heads[index] - count
+        result = []
+        for i in range(count):
+            slot = base + (start + i) % depth
+            if self._seqs[slot] > since:
+                result.append((self._seqs[slot], self._times[slot], self._values[slot]))
+        return result
+
+    # ============ PUBLIC: Kompatibel dict ============
+    def __setitem__(self, name, value):
+        self.append(name, value)
+
+    def __getitem__(self, name):
+        index = self._index.get(name)
+        if index is None or not self._counts[index]:
+            raise KeyError(name)
+        return self._values[self._last_slot(index)]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, name, default=None):
+        return self.latest(name, default)
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return self.snapshot().items()
+
+    # ============ PRIVATE ============
+    def _last_slot(self, index):
+        head = self._heads[index]
+        return index * self.depth + (head - 1 if head else self.depth - 1)
+
+
+class DeltaFeed:
+    """
+    Producer stream (microapi.StreamResponse) yang mengirim delta telemetry:
+    setiap ada sampel baru, satu event `{"seq": N, "values": {...}}` berisi
+    channel yang berubah saja. Sampel yang masuk berdekatan digabung jadi
+    satu event (paling sering tiap `min_interval_ms`).
+    """
+
+    def __init__(self, store, since=0, min_interval_ms=200, kind=None):
+        """
+        Args:
+            kind: Jika diisi, ditambahkan sebagai field "type" di tiap pesan
+                  (dipakai di WebSocket untuk membedakan push dari balasan)
+        """
+        self.store = store
+        self.kind = kind
+        self.since = since
+        self.min_interval_ms = min_interval_ms
+
+    async def run(self, stream):
+        store = self.store
+        if self.since > store.seq:
+            self.since = 0  # device restart: kirim ulang semua
+        while not stream.closed:
+            if not await store.wait(self.since, 30_000):
+                continue
+            delta = store.snapshot(self.since)
+            self.since = store.seq
+            if not delta:
+                continue
+            message = {"seq": self.since, "values": delta}
+            if self.kind:
+                message["type"] = self.kind
+            if not stream.event(json.dumps(message), id=self.since):
+                break
+            await asyncio.sleep(self.min_interval_ms / 1000)
@@ -0,0 +1,28 @@
+"""
+Fungsi waktu ala MicroPython (ticks_ms, ticks_us, ticks_diff, ...) yang juga
+jalan di CPython, supaya modul RS485/Modbus bisa dites di Linux.
+"""
+import time
+
+try:
+    ticks_ms = time.ticks_ms
+    ticks_us = time.ticks_us
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+    sleep_us = time.sleep_us
+except AttributeError:
+    # CPython: pakai jam monotonic, tanpa wrap-around
+    def ticks_ms():
+        return time.monotonic_ns() // 1_000_000
+
+    def ticks_us():
+        return time.monotonic_ns() // 1_000
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_us(us):
+        time.sleep(us / 1_000_000)
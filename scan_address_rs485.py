@@ -8,6 +8,7 @@ Konfigurasi Pin:
 
 from machine import UART, Pin
 import time
+from checksum import crc16_modbus
 
 # Konfigurasi Pin
 RST_PIN = 14  # Pin untuk DE/RE (Direction Enable/Receiver Enable)
@@ -169,16 +170,7 @@ def scan_modbus_addresses(start_addr=1, end_addr=247):
 
 def calculate_modbus_crc(data):
     """Hitung CRC16 untuk Modbus RTU"""
-    crc = 0xFFFF
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if crc & 0x0001:
-                crc >>= 1
-                crc ^= 0xA001
-            else:
-                crc >>= 1
-    return crc
+    return crc16_modbus(data)
 
 def test_communication(address):
     """Test komunikasi dengan address tertentu"""
@@ -149,13 +149,6 @@ def crc32(data, crc=0):
     if binascii:
         return binascii.crc32(data, crc)
     else:
-        # Fallback implementation if binascii is not available
-        crc = crc ^ 0xFFFFFFFF
-        for byte in data:
-            crc = crc ^ byte
-            for _ in range(8):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 0xEDB88320
-                else:
-                    crc = crc >> 1
-        return crc ^ 0xFFFFFFFF
\ No newline at end of file
+        # Fallback if binascii is not available: shared table-driven CRC32
+        from checksum import crc32 as _crc32
+        return _crc32(data, crc)
\ No newline at end of file